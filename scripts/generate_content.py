@@ -6,20 +6,21 @@ Twitter热门内容抓取和文章生成脚本
 
 import os
 import json
-import requests
+import time
 import asyncio
 from datetime import datetime
-from typing import List, Dict
-import openai
+from typing import List, Dict, Optional
 from pathlib import Path
 import re
-from dotenv import load_dotenv
 
 # 导入新的Twitter客户端
-from twitter_client import UnifiedTwitterClient
+from twitter_client import (
+    SEARCH_PAGE_MAX_RESULTS, STATE_DIR, Tweet, TweetDeduplicator, UnifiedTwitterClient, load_env, load_twikit_credentials, plan_search_queries,
+    as_tweet, classify_tweet_topics, engagement_score, run_sync, shared_cassette
+)
 
 # 加载环境变量
-load_dotenv()
+load_env()
 
 # 配置
 TWITTER_API_KEY = os.environ.get('TWITTER_API_KEY')
@@ -27,55 +28,188 @@ OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 AI_API_KEY = os.environ.get('AI_API_KEY')
 AI_BASE_URL = os.environ.get('AI_BASE_URL')
 CONTENT_DIR = Path(__file__).parent.parent / 'content'
-
-# 初始化OpenAI（保持向后兼容）
-openai.api_key = OPENAI_API_KEY
+SEARCH_CONCURRENCY = int(os.environ.get('CRYPTO_SEARCH_CONCURRENCY', '4'))
+# 是否把各话题关键词合并成尽量少的搜索请求
+QUERY_CONSOLIDATION = os.environ.get('CRYPTO_QUERY_CONSOLIDATION', 'true').lower() in ('1', 'true', 'yes')
+RESULTS_PER_TOPIC = 20
+# 合并查询后某话题归类到的推文少于该值时，为它单独补搜一次
+TOPIC_MIN_RESULTS = int(os.environ.get('CRYPTO_TOPIC_MIN_RESULTS', str(RESULTS_PER_TOPIC // 2)))
+# 跨查询去重后最多保留的推文数（按参与度淘汰），0表示不限制
+DEDUP_MAX_TWEETS = int(os.environ.get('CRYPTO_DEDUP_MAX_TWEETS', '0'))
+# 已处理推文和已发布文章的记录，超过保留天数的条目自动清理
+SEEN_STORE_FILE = os.environ.get('CRYPTO_SEEN_STORE', os.path.join(STATE_DIR, 'seen_tweets.json'))
+SEEN_RETENTION_DAYS = float(os.environ.get('CRYPTO_SEEN_RETENTION_DAYS', '30'))
+
+# 区块链和加密货币相关的话题及搜索关键词
+CRYPTO_TOPICS = {
+    'bitcoin': ['bitcoin', 'BTC', '比特币'],
+    'ethereum': ['ethereum', 'ETH', '以太坊'],
+    'blockchain': ['blockchain', '区块链'],
+    'cryptocurrency': ['cryptocurrency', '加密货币'],
+    'defi': ['DeFi', '去中心化金融'],
+    'nft': ['NFT', '非同质化代币'],
+    'web3': ['Web3', '元宇宙'],
+}
+
+class SeenTweetStore:
+    """
+    已处理推文id和已发布文章路径的本地记录，持久化到JSON文件（path为None时只保存在内存中）
+    按推文id和文章路径建立索引，超过保留期的条目在加载和保存时清理
+    """
+    
+    def __init__(self, path: str = SEEN_STORE_FILE, retention_days: float = SEEN_RETENTION_DAYS):
+        self.path = path
+        self.retention = retention_days * 86400
+        self.tweets = {}
+        self.articles = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.tweets = data.get('tweets', {})
+                self.articles = data.get('articles', {})
+            except (OSError, ValueError) as e:
+                print(f"⚠️  已处理推文记录加载失败: {e}")
+        self.expire()
+    
+    def expire(self, now: float = None) -> int:
+        """清理超过保留期的条目，返回清理的条数"""
+        cutoff = (now or time.time()) - self.retention
+        expired_tweets = [key for key, entry in self.tweets.items() if entry.get('seen_at', 0) < cutoff]
+        expired_articles = [key for key, entry in self.articles.items() if entry.get('published_at', 0) < cutoff]
+        for key in expired_tweets:
+            del self.tweets[key]
+        for key in expired_articles:
+            del self.articles[key]
+        removed = len(expired_tweets) + len(expired_articles)
+        if removed:
+            self._dirty = True
+        return removed
+    
+    def __len__(self) -> int:
+        return len(self.tweets)
+    
+    def has(self, tweet_id: str) -> bool:
+        return bool(tweet_id) and str(tweet_id) in self.tweets
+    
+    def filter_unseen(self, tweets: List[Tweet]) -> List[Tweet]:
+        """去掉已处理过的推文"""
+        return [tweet for tweet in tweets if not self.has(tweet.get('id'))]
+    
+    def article_owner(self, path: str) -> Optional[str]:
+        """已发布文章对应的推文id，未记录时返回None"""
+        entry = self.articles.get(str(path))
+        return entry.get('tweet_id') if entry else None
+    
+    def mark(self, tweet_id: str, paths: List[str]):
+        """记录推文已处理及其生成的文章"""
+        now = time.time()
+        self.tweets[str(tweet_id)] = {'seen_at': now, 'articles': [str(path) for path in paths]}
+        for path in paths:
+            self.articles[str(path)] = {'tweet_id': str(tweet_id), 'published_at': now}
+        self._dirty = True
+    
+    def save(self):
+        if not self._dirty or not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'tweets': self.tweets, 'articles': self.articles}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            print(f"⚠️  已处理推文记录保存失败: {e}")
 
 class TwitterTrendFetcher:
     """Twitter趋势获取器 - 使用统一客户端"""
     
-    def __init__(self):
+    def __init__(self, seen_store: SeenTweetStore = None):
         self.client = UnifiedTwitterClient()
+        self.seen_store = seen_store
         print("✅ 统一Twitter客户端已初始化")
     
-    async def get_crypto_trending_topics_async(self, max_results: int = 100) -> List[Dict]:
+    async def get_crypto_trending_topics_async(self, max_results: int = 100,
+                                               concurrency: int = None) -> List[Dict]:
         """
         异步获取区块链和加密货币相关的热门话题
+        各关键词并发搜索，并发数由 concurrency 或 CRYPTO_SEARCH_CONCURRENCY 控制
         """
-        # 区块链和加密货币相关的搜索关键词
-        crypto_queries = [
-            "bitcoin OR BTC OR 比特币",
-            "ethereum OR ETH OR 以太坊", 
-            "blockchain OR 区块链",
-            "cryptocurrency OR 加密货币",
-            "DeFi OR 去中心化金融",
-            "NFT OR 非同质化代币",
-            "Web3 OR 元宇宙"
-        ]
+        # 合并后每条查询覆盖多个话题，按覆盖话题数放大单次请求条数
+        # 每条查询的话题数以一页能容纳各话题 RESULTS_PER_TOPIC 条为限，服务端一页返回得少时按游标翻页补足
+        if QUERY_CONSOLIDATION:
+            plans = plan_search_queries(CRYPTO_TOPICS,
+                                        max_topics=max(1, SEARCH_PAGE_MAX_RESULTS // RESULTS_PER_TOPIC))
+        else:
+            plans = [
+                {'query': ' OR '.join(keywords), 'topics': [topic], 'keywords': keywords}
+                for topic, keywords in CRYPTO_TOPICS.items()
+            ]
+        print(f"🧮 {len(CRYPTO_TOPICS)} 个话题合并为 {len(plans)} 条搜索查询")
         
-        all_tweets = []
+        merged = TweetDeduplicator(DEDUP_MAX_TWEETS)
+        semaphore = asyncio.Semaphore(concurrency or SEARCH_CONCURRENCY)
         
-        for query in crypto_queries:
-            try:
+        async def search_one(plan: Dict) -> List[Tweet]:
+            query = plan['query']
+            target = RESULTS_PER_TOPIC * len(plan['topics'])
+            tweets = []
+            async with semaphore:
                 print(f"🔍 搜索关键词: {query}")
-                tweets = await self.client.search_tweets(query, max_results=20)
-                print(f"   找到 {len(tweets)} 条相关推文")
-                all_tweets.extend(tweets)
-                
-            except Exception as e:
-                print(f"   搜索失败: {e}")
-                continue
+                try:
+                    # 不假设单页能返回多少条，沿游标取满各话题所需的条数
+                    async for page in self.client.stream_search_tweets(
+                            query, page_size=min(target, SEARCH_PAGE_MAX_RESULTS), max_total=target):
+                        tweets.extend(page)
+                except Exception as e:
+                    print(f"   搜索失败 [{query}]: {e}")
+            return tweets
+        
+        async def run_plans(plans: List[Dict]):
+            # 按完成顺序合并结果，单个查询失败或变慢不影响其他查询
+            # 同一推文可能命中多条查询，按id去重避免重复计分
+            for future in asyncio.as_completed([search_one(plan) for plan in plans]):
+                tweets = await future
+                added = merged.add(tweets)
+                print(f"   找到 {len(tweets)} 条相关推文（新增 {added} 条）")
+        
+        await run_plans(plans)
+        
+        # 在本地把推文归回各话题；合并查询的结果可能被少数话题占满，为覆盖不足的话题单独补搜
+        classified = classify_tweet_topics(merged.results(), CRYPTO_TOPICS)
+        shared = {topic for plan in plans if len(plan['topics']) > 1 for topic in plan['topics']}
+        lacking = [topic for topic in CRYPTO_TOPICS if topic in shared and len(classified[topic]) < TOPIC_MIN_RESULTS]
+        if lacking:
+            print(f"🔁 话题覆盖不足（少于 {TOPIC_MIN_RESULTS} 条），单独补搜: {', '.join(lacking)}")
+            await run_plans([plan for topic in lacking for plan in plan_search_queries({topic: CRYPTO_TOPICS[topic]})])
+            classified = classify_tweet_topics(merged.results(), CRYPTO_TOPICS)
+        print("   " + " | ".join(f"{topic}: {len(items)}" for topic, items in classified.items()))
+        
+        all_tweets = merged.results()
+        print(f"📊 总共收集到 {len(all_tweets)} 条加密货币相关推文（重复 {merged.duplicates} 条）")
+        if merged.evicted:
+            print(f"   超过 {DEDUP_MAX_TWEETS} 条上限，已淘汰 {merged.evicted} 条低参与度推文")
+        
+        # 排名前去掉之前运行已生成过文章的推文
+        if self.seen_store is not None:
+            unseen = self.seen_store.filter_unseen(all_tweets)
+            if len(unseen) < len(all_tweets):
+                print(f"   跳过 {len(all_tweets) - len(unseen)} 条已处理过的推文")
+            all_tweets = unseen
         
-        print(f"📊 总共收集到 {len(all_tweets)} 条加密货币相关推文")
         return self._get_top_tweets_by_engagement(all_tweets)
     
-    def get_crypto_trending_topics(self, max_results: int = 100) -> List[Dict]:
+    def get_crypto_trending_topics(self, max_results: int = 100, concurrency: int = None) -> List[Dict]:
         """
         获取区块链和加密货币相关的热门话题（同步版本）
         """
-        return asyncio.run(self.get_crypto_trending_topics_async(max_results))
+        return run_sync(self.get_crypto_trending_topics_async(max_results, concurrency))
     
-    def _get_top_tweets_by_engagement(self, tweets: List[Dict]) -> List[Dict]:
+    def _get_top_tweets_by_engagement(self, tweets: List[Tweet]) -> List[Tweet]:
         """
         根据点赞和转发数量选择最热门的推文
         """
@@ -85,18 +219,16 @@ class TwitterTrendFetcher:
         
         # 计算每条推文的参与度分数
         scored_tweets = []
-        for tweet in tweets:
-            # 获取互动数据
-            like_count = tweet.get('likeCount', 0)
-            retweet_count = tweet.get('retweetCount', 0)
-            reply_count = tweet.get('replyCount', 0)
+        for tweet in map(as_tweet, tweets):
+            # 获取互动数据（旧的字典格式推文先转换为Tweet记录）
+            like_count = tweet.like_count
+            retweet_count = tweet.retweet_count
+            reply_count = tweet.reply_count
             
             # 计算参与度分数 (点赞 + 转发*2 + 回复*1.5)
-            engagement_score = like_count + (retweet_count * 2) + (reply_count * 1.5)
-            
             scored_tweets.append({
                 'tweet': tweet,
-                'engagement_score': engagement_score,
+                'engagement_score': engagement_score(tweet),
                 'like_count': like_count,
                 'retweet_count': retweet_count,
                 'reply_count': reply_count
@@ -111,7 +243,7 @@ class TwitterTrendFetcher:
         print("🏆 最热门的3条推文:")
         for i, item in enumerate(top_tweets, 1):
             tweet = item['tweet']
-            text = tweet.get('text', '')[:100]
+            text = tweet.text[:100]
             print(f"   {i}. 👍{item['like_count']} 🔄{item['retweet_count']} 💬{item['reply_count']} - {text}...")
         
         return [item['tweet'] for item in top_tweets]
@@ -227,6 +359,8 @@ class ContentGenerator:
     """内容生成器，支持OpenAI和备用AI服务"""
     
     def __init__(self, api_key: str, backup_api_key: str = None, backup_base_url: str = None):
+        # openai导入较慢，只在真正生成内容时加载
+        import openai
         self.primary_client = openai.OpenAI(api_key=api_key)
         self.backup_client = None
         
@@ -413,22 +547,23 @@ class HugoPublisher:
         
         print(f"文章已发布: {filepath}")
     
-    def publish_crypto_article(self, article: Dict):
-        """发布加密货币文章到对应语言目录"""
-        date = datetime.now()
-        
+    def crypto_article_path(self, language: str, filename: str, date: datetime = None) -> Path:
+        """加密货币文章的文件路径（使用自定义文件名）"""
+        date = date or datetime.now()
+        return self.content_dir / language / 'posts' / f"{date.strftime('%Y-%m-%d')}-{filename}.md"
+    
+    def publish_crypto_article(self, article: Dict) -> Path:
+        """发布加密货币文章到对应语言目录，返回文件路径"""
         # 根据语言确定目录
         language = article['language']
-        
-        # 使用自定义文件名
-        filename = f"{date.strftime('%Y-%m-%d')}-{article['filename']}.md"
-        filepath = self.content_dir / language / 'posts' / filename
+        filepath = self.crypto_article_path(language, article['filename'])
         
         # 直接写入文章内容（已包含frontmatter）
         with open(filepath, 'w', encoding='utf-8') as f:
             f.write(article['content'])
         
         print(f"✅ {language.upper()}加密货币文章已发布: {filepath}")
+        return filepath
     
     def _create_slug(self, title: str) -> str:
         """创建URL友好的slug"""
@@ -785,15 +920,22 @@ From a long-term investment perspective:
         'filename': f"crypto-analysis-{index}"
     }
 
+def content_key(path: Path) -> str:
+    """文章相对content目录的路径，作为已发布记录的键"""
+    return Path(path).relative_to(CONTENT_DIR).as_posix()
+
 def main():
     """主函数"""
     print("开始生成今日内容...")
     
     # 检查Twitter API配置
     has_twitter_api = bool(os.environ.get('TWITTER_API_KEY'))
-    has_twikit_config = bool(os.environ.get('TWITTER_USERNAME') and os.environ.get('TWITTER_PASSWORD'))
+    has_twikit_config = bool(load_twikit_credentials())
+    # 回放录像不访问网络，不需要凭据
+    cassette = shared_cassette()
+    replaying = cassette is not None and cassette.replaying
     
-    if not has_twitter_api and not has_twikit_config:
+    if not has_twitter_api and not has_twikit_config and not replaying:
         print("❌ 错误：请配置Twitter API密钥或Twikit登录凭据")
         print("   TwitterAPI.io: 设置 TWITTER_API_KEY")
         print("   Twikit: 设置 TWITTER_USERNAME, TWITTER_PASSWORD, TWITTER_EMAIL")
@@ -806,7 +948,14 @@ def main():
         demo_mode = False
     
     # 初始化组件
-    fetcher = TwitterTrendFetcher()
+    if replaying:
+        # 录制后的已处理记录会过滤掉录制时选中的推文，回放时不读写，排名与录制时一致
+        seen_store = SeenTweetStore(path=None)
+        print("📼 回放模式：不使用已处理推文记录")
+    else:
+        seen_store = SeenTweetStore()
+        print(f"🗂️  已处理推文记录: {len(seen_store)} 条（保留 {SEEN_RETENTION_DAYS:g} 天）")
+    fetcher = TwitterTrendFetcher(seen_store)
     if not demo_mode:
         generator = ContentGenerator(
             api_key=OPENAI_API_KEY,
@@ -826,18 +975,35 @@ def main():
     print(f"✅ 找到 {len(top_tweets)} 条热门推文")
     
     # 为每条热门推文生成双语文章
-    for i, tweet in enumerate(top_tweets, 1):
-        print(f"\n📝 处理第 {i} 条推文...")
+    index = 0
+    for tweet in top_tweets:
+        if seen_store.has(tweet.id):
+            print(f"\n⏭️  推文 {tweet.id} 已生成过文章，跳过")
+            continue
+        
+        # 同一天多次运行时不覆盖之前发布的文章
+        index += 1
+        while any(seen_store.article_owner(content_key(path)) for path in (
+                publisher.crypto_article_path('zh', f"crypto-analysis-{index}"),
+                publisher.crypto_article_path('en', f"crypto-analysis-{index}"))):
+            index += 1
+        print(f"\n📝 处理第 {index} 条推文...")
         
         # 生成中文文章
         print("  📄 生成中文文章...")
-        zh_article = create_crypto_article_from_tweet_zh(tweet, i)
-        publisher.publish_crypto_article(zh_article)
+        zh_article = create_crypto_article_from_tweet_zh(tweet, index)
+        zh_path = publisher.publish_crypto_article(zh_article)
         
         # 生成英文文章
         print("  📄 生成英文文章...")
-        en_article = create_crypto_article_from_tweet_en(tweet, i)
-        publisher.publish_crypto_article(en_article)
+        en_article = create_crypto_article_from_tweet_en(tweet, index)
+        en_path = publisher.publish_crypto_article(en_article)
+        
+        seen_store.mark(tweet.id, [content_key(zh_path), content_key(en_path)])
+    
+    # 文章全部发布后再保存高水位和已处理记录
+    fetcher.client.save_watermarks()
+    seen_store.save()
     
     print("\n内容生成完成！")
 
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+UnifiedTwitterClient 压测脚本
+对本地模拟服务器（或 --url 指定的兼容服务）发起并发获取，报告吞吐、尾延迟和错误处理情况
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import contextlib
+import urllib.request
+from pathlib import Path
+from typing import Dict, List
+
+# 添加脚本目录到Python路径
+sys.path.append(str(Path(__file__).parent))
+
+from mock_twitterapi_server import add_server_arguments, api_from_args, start_server
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def fetch_server_stats(base_url: str) -> Dict:
+    """读取模拟服务器的请求统计"""
+    root = base_url.rsplit('/twitter', 1)[0]
+    try:
+        with urllib.request.urlopen(f"{root}/stats", timeout=5) as response:
+            return json.loads(response.read())
+    except Exception:
+        return {}
+
+async def run_load(client, accounts: List[str], queries: List[str], rounds: int,
+                   concurrency: int, max_results: int) -> List[Dict]:
+    """按轮次并发获取所有账号和查询，返回每次调用的结果"""
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def call(kind: str, target: str) -> Dict:
+        async with semaphore:
+            start = time.perf_counter()
+            error = None
+            try:
+                if kind == 'user':
+                    tweets = await client.get_user_tweets(target, max_results)
+                else:
+                    tweets = await client.search_tweets(target, max_results)
+            except Exception as e:
+                tweets = []
+                error = str(e)
+            return {
+                'kind': kind,
+                'target': target,
+                'tweets': len(tweets),
+                'latency': time.perf_counter() - start,
+                'error': error,
+            }
+    
+    results = []
+    for _ in range(rounds):
+        calls = [call('user', account) for account in accounts]
+        calls += [call('search', query) for query in queries]
+        results.extend(await asyncio.gather(*calls))
+    return results
+
+def print_report(results: List[Dict], elapsed: float, server_stats: Dict, client) -> bool:
+    """打印压测报告，返回是否在允许的失败率内"""
+    latencies = [item['latency'] for item in results]
+    failed = [item for item in results if not item['tweets']]
+    raised = [item for item in results if item['error']]
+    
+    print("\n" + "=" * 50)
+    print("📊 压测报告")
+    print("=" * 50)
+    print(f"调用次数: {len(results)}，耗时 {elapsed:.2f}s，吞吐 {len(results) / elapsed:.1f} 次/秒")
+    if server_stats:
+        requests = server_stats.get('requests', 0)
+        print(f"HTTP请求: {requests}（{requests / elapsed:.1f} 次/秒），"
+              f"成功 {server_stats.get('ok', 0)}，429 {server_stats.get('rate_limited', 0)}，"
+              f"5xx {server_stats.get('server_errors', 0)}")
+    print(f"延迟: p50={percentile(latencies, 0.5) * 1000:.0f}ms "
+          f"p95={percentile(latencies, 0.95) * 1000:.0f}ms "
+          f"p99={percentile(latencies, 0.99) * 1000:.0f}ms "
+          f"max={max(latencies, default=0) * 1000:.0f}ms")
+    print(f"失败调用: {len(failed)}（{len(failed) / max(len(results), 1):.1%}），抛出异常 {len(raised)}")
+    print(f"数据源胜出: {client.backend_wins}")
+    print(f"请求合并: {client.coalesce_stats}")
+    open_breakers = [key for key, breaker in client.breakers.items() if breaker.state != 'closed']
+    if open_breakers:
+        print(f"未关闭的熔断器: {', '.join(open_breakers)}")
+    return not raised
+
+def main():
+    parser = argparse.ArgumentParser(description='UnifiedTwitterClient 压测')
+    parser.add_argument('--url', help='已运行的兼容服务地址，不指定时在进程内启动模拟服务器')
+    parser.add_argument('--accounts', type=int, default=50, help='模拟账号数')
+    parser.add_argument('--queries', type=int, default=5, help='模拟搜索查询数')
+    parser.add_argument('--rounds', type=int, default=3, help='轮次')
+    parser.add_argument('--concurrency', type=int, default=20, help='压测端并发数')
+    parser.add_argument('--max-results', type=int, default=20)
+    parser.add_argument('--client-rate', type=float, default=1000, help='客户端令牌桶速率（次/秒）')
+    parser.add_argument('--quiet', action='store_true', help='不输出客户端的逐条请求日志')
+    parser.add_argument('--max-failure-rate', type=float, default=None,
+                        help='失败调用比例超过该值时返回非零退出码')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    
+    server = None
+    base_url = args.url
+    if not base_url:
+        server = start_server(api_from_args(args))
+        base_url = f"http://127.0.0.1:{server.server_port}/twitter"
+        print(f"🧪 模拟服务器: {base_url} (latency={args.latency}, 5xx={args.error_rate}, "
+              f"429突发={args.burst_duration}s/{args.burst_interval}s)")
+    
+    # 客户端配置来自环境变量，需在导入前设置；压测不使用磁盘状态
+    os.environ['TWITTER_API_BASE_URL'] = base_url
+    os.environ.setdefault('TWITTER_API_KEY', 'load-test')
+    os.environ['TWITTERAPI_RATE_LIMIT'] = str(args.client_rate)
+    os.environ['TWITTERAPI_RATE_BURST'] = str(max(1, int(args.client_rate)))
+    os.environ['TWITTER_HTTP_CACHE'] = 'false'
+    os.environ['TWITTER_INCREMENTAL'] = 'false'
+    from twitter_client import UnifiedTwitterClient
+    
+    # 导入时已加载 .env；清空其中的Twikit凭据（含带数字后缀的多组），
+    # 并去掉Twikit数据源（无凭据时仍会以访客模式访问真实站点），失败时只统计不兜底
+    for key in list(os.environ):
+        if re.fullmatch(r'TWITTER_(USERNAME|PASSWORD|EMAIL)(_\d+)?', key):
+            os.environ[key] = ''
+    
+    client = UnifiedTwitterClient()
+    client.twikit_client = None
+    accounts = [f"mock_user_{i}" for i in range(args.accounts)]
+    queries = [f"topic{i} OR keyword{i}" for i in range(args.queries)]
+    
+    async def run():
+        try:
+            return await run_load(client, accounts, queries, args.rounds, args.concurrency, args.max_results)
+        finally:
+            await client.aclose()
+    
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) if args.quiet else contextlib.nullcontext():
+        results = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    
+    ok = print_report(results, elapsed, fetch_server_stats(base_url), client)
+    if args.max_failure_rate is not None:
+        failure_rate = sum(1 for item in results if not item['tweets']) / max(len(results), 1)
+        ok = ok and failure_rate <= args.max_failure_rate
+    if server:
+        server.shutdown()
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
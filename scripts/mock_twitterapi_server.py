@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+TwitterAPI.io 本地模拟服务器
+模拟 /user/tweets 和 /tweet/advanced_search，支持可配置的延迟分布、429突发、5xx错误率和分页，
+无需真实凭据即可压测 UnifiedTwitterClient
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+import argparse
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+def parse_latency(spec: str):
+    """
+    解析延迟分布，返回生成延迟（秒）的函数
+    fixed:50 | uniform:20,80 | exp:50 | lognormal:50,0.5（中位数毫秒, sigma）
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',') if v]
+    if kind == 'fixed':
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'exp':
+        return lambda rng: rng.expovariate(1000 / values[0])
+    if kind == 'lognormal':
+        median, sigma = values[0] / 1000, (values[1] if len(values) > 1 else 0.5)
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"未知的延迟分布: {spec}")
+
+class MockTwitterAPI:
+    """模拟数据源和故障注入配置，与HTTP层分离便于在进程内使用"""
+    
+    def __init__(self, latency: str = 'lognormal:80,0.4', error_rate: float = 0.0,
+                 burst_interval: float = 0.0, burst_duration: float = 0.0,
+                 pages: int = 3, tweets_per_hour: Optional[float] = None, seed: int = 0):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.burst_interval = burst_interval
+        self.burst_duration = burst_duration
+        self.pages = pages
+        self.tweets_per_hour = tweets_per_hour
+        self.started_at = time.time()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'ok': 0, 'rate_limited': 0, 'server_errors': 0, 'unauthorized': 0}
+    
+    def _random(self) -> random.Random:
+        with self._lock:
+            return random.Random(self._rng.random())
+    
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+    
+    def in_burst(self, now: float) -> Tuple[bool, float]:
+        """当前是否处于429突发期，返回 (是否限流, 突发剩余秒数)"""
+        if self.burst_interval <= 0 or self.burst_duration <= 0:
+            return False, 0.0
+        position = (now - self.started_at) % self.burst_interval
+        remaining = self.burst_interval - position
+        return remaining <= self.burst_duration, remaining
+    
+    def _timeline(self, key: str, now: float, since_id: int) -> List[Tuple[int, float, int]]:
+        """
+        按账号/查询生成确定性的时间线 [(id, 发布时间, 序号)]，从新到旧
+        每个key有自己的发帖速率，新推文随时间出现
+        """
+        seed = zlib.crc32(key.encode('utf-8'))
+        rate = self.tweets_per_hour or (0.5 + (seed % 600) / 20)
+        gap = 3600 / rate
+        # 最多返回最近 pages*100 条
+        newest = int((now - self.started_at) // gap)
+        oldest = newest - self.pages * 100
+        tweets = []
+        for seq in range(newest, oldest, -1):
+            created = self.started_at + seq * gap
+            # 类snowflake的id：随时间单调递增，低位区分不同key
+            tweet_id = int(created * 1000) * 1000 + seed % 1000
+            if tweet_id <= since_id:
+                break
+            tweets.append((tweet_id, created, seq))
+        return tweets
+    
+    def _tweet(self, key: str, tweet_id: int, created: float, seq: int) -> Dict:
+        seed = zlib.crc32(key.encode('utf-8'))
+        rng = random.Random(tweet_id)
+        author = key if not key.startswith('search:') else f"user{rng.randrange(1000)}"
+        return {
+            'type': 'tweet',
+            'id': str(tweet_id),
+            'url': f"https://x.com/{author}/status/{tweet_id}",
+            'text': f"{key.split(':', 1)[-1]} update #{seq}",
+            'createdAt': datetime.fromtimestamp(created, timezone.utc).strftime('%a %b %d %H:%M:%S +0000 %Y'),
+            'likeCount': rng.randrange(0, 5000),
+            'retweetCount': rng.randrange(0, 800),
+            'replyCount': rng.randrange(0, 300),
+            'quoteCount': rng.randrange(0, 50),
+            'viewCount': rng.randrange(1000, 500000),
+            'lang': 'en',
+            'author': {
+                'userName': author,
+                'name': author.title(),
+                'id': str(seed),
+                'followers': rng.randrange(100, 1000000),
+                'description': 'mock account',
+            },
+            'entities': {'hashtags': [], 'urls': [], 'user_mentions': []},
+        }
+    
+    def handle(self, path: str, params: Dict[str, str], api_key: Optional[str]) -> Tuple[int, Dict, Dict]:
+        """处理一次请求，返回 (状态码, 响应头, JSON体)"""
+        self._count('requests')
+        rng = self._random()
+        time.sleep(max(0.0, self.latency(rng)))
+        
+        if not api_key:
+            self._count('unauthorized')
+            return 401, {}, {'status': 'error', 'msg': 'missing api key'}
+        
+        now = time.time()
+        limited, remaining = self.in_burst(now)
+        if limited:
+            self._count('rate_limited')
+            headers = {
+                'Retry-After': str(max(1, math.ceil(remaining))),
+                'x-rate-limit-remaining': '0',
+                'x-rate-limit-reset': str(int(now + remaining)),
+            }
+            return 429, headers, {'status': 'error', 'msg': 'Too Many Requests'}
+        
+        if rng.random() < self.error_rate:
+            self._count('server_errors')
+            return rng.choice([500, 502, 503]), {}, {'status': 'error', 'msg': 'upstream error'}
+        
+        max_results = min(int(params.get('max_results', 20)), 100)
+        offset = int(params.get('cursor') or 0)
+        if path.endswith('/user/tweets'):
+            key = params.get('username', '')
+            since_id = int(params.get('since_id') or 0)
+        elif path.endswith('/tweet/advanced_search'):
+            query = params.get('query', '')
+            match = re.search(r'since_id:(\d+)', query)
+            since_id = int(match.group(1)) if match else 0
+            key = 'search:' + re.sub(r'\s*since_id:\d+', '', query).strip()
+        else:
+            return 404, {}, {'status': 'error', 'msg': 'not found'}
+        
+        # 只为当前页组装推文JSON
+        timeline = self._timeline(key, now, since_id)
+        page = [self._tweet(key, *item) for item in timeline[offset:offset + max_results]]
+        next_offset = offset + max_results
+        has_next = next_offset < len(timeline) and next_offset < self.pages * max_results
+        self._count('ok')
+        return 200, {}, {
+            'status': 'success',
+            'tweets': page,
+            'has_next_page': has_next,
+            'next_cursor': str(next_offset) if has_next else '',
+        }
+
+class MockServer(ThreadingHTTPServer):
+    # 默认监听队列只有5，并发建连时会丢SYN并触发1秒重传
+    request_queue_size = 256
+    daemon_threads = True
+
+def make_handler(api: MockTwitterAPI):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # 响应头和响应体分两次写出，关闭Nagle避免与延迟ACK叠加出40ms的额外延迟
+        disable_nagle_algorithm = True
+        
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/stats':
+                status, headers, body = 200, {}, dict(api.stats)
+            else:
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                status, headers, body = api.handle(url.path, params, self.headers.get('X-API-Key'))
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+        
+        def log_message(self, *args):
+            pass
+    
+    return Handler
+
+def start_server(api: MockTwitterAPI, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """在后台线程启动服务器，port为0时自动分配端口"""
+    server = MockServer((host, port), make_handler(api))
+    threading.Thread(target=server.serve_forever, name='mock-twitterapi', daemon=True).start()
+    return server
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--latency', default='lognormal:80,0.4',
+                        help='延迟分布: fixed:50 | uniform:20,80 | exp:50 | lognormal:中位数ms,sigma')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='5xx错误比例，如0.02')
+    parser.add_argument('--burst-interval', type=float, default=0.0, help='每隔多少秒出现一次429突发')
+    parser.add_argument('--burst-duration', type=float, default=0.0, help='每次429突发持续秒数')
+    parser.add_argument('--pages', type=int, default=3, help='每个账号/查询可翻的页数')
+    parser.add_argument('--tweets-per-hour', type=float, default=None, help='固定发帖速率（默认按账号变化）')
+    parser.add_argument('--seed', type=int, default=0)
+
+def api_from_args(args) -> MockTwitterAPI:
+    return MockTwitterAPI(
+        latency=args.latency, error_rate=args.error_rate,
+        burst_interval=args.burst_interval, burst_duration=args.burst_duration,
+        pages=args.pages, tweets_per_hour=args.tweets_per_hour, seed=args.seed
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='TwitterAPI.io 本地模拟服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    
+    server = start_server(api_from_args(args), args.host, args.port)
+    print(f"🧪 模拟服务器已启动: http://{args.host}:{server.server_port}/twitter")
+    print(f"   设置 TWITTER_API_BASE_URL=http://{args.host}:{server.server_port}/twitter 即可指向本服务器")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("\n✅ 模拟服务器已停止")
+
+if __name__ == "__main__":
+    main()
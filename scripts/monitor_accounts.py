@@ -6,29 +6,56 @@ Twitter账号监控脚本
 
 import os
 import json
-import requests
+import time
+import signal
+import math
+import argparse
 import asyncio
 from datetime import datetime, timedelta
-from typing import List, Dict
-import openai
+from typing import List, Dict, Optional
 from pathlib import Path
 import re
-from dotenv import load_dotenv
 
 # 导入新的Twitter客户端
-from twitter_client import UnifiedTwitterClient, get_all_monitored_tweets_sync
+from twitter_client import (
+    UnifiedTwitterClient, get_all_monitored_tweets_async, get_all_monitored_tweets_sync,
+    STATE_DIR, WATERMARK_FILE, HighWaterMarks, load_env, load_twikit_credentials, normalize_accounts, run_sync,
+    shared_cassette, tweet_timestamp
+)
 
 # 加载环境变量
-load_dotenv()
+load_env()
 
 # 配置
 TWITTER_API_KEY = os.environ.get('TWITTER_API_KEY')
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 AI_API_KEY = os.environ.get('AI_API_KEY')
 AI_BASE_URL = os.environ.get('AI_BASE_URL')
-TWT_ACCOUNTS = os.environ.get('TWT_ACCOUNTS', '').split(',')
+TWT_ACCOUNTS = normalize_accounts(os.environ.get('TWT_ACCOUNTS', '').split(','))
 CONTENT_DIR = Path(__file__).parent.parent / 'content'
 
+# 常驻模式（--daemon）：默认轮询间隔（秒），以及按账号覆盖的间隔，如 "VitalikButerin=300,cz_binance=600"
+POLL_INTERVAL = float(os.environ.get('MONITOR_POLL_INTERVAL', '900'))
+POLL_INTERVALS = {
+    name.strip().lstrip('@').lower(): float(seconds)
+    for name, _, seconds in (
+        item.partition('=') for item in os.environ.get('MONITOR_POLL_INTERVALS', '').split(',') if '=' in item
+    )
+}
+DAEMON_STATE_FILE = os.environ.get('MONITOR_DAEMON_STATE', os.path.join(STATE_DIR, 'monitor_daemon.json'))
+# 退出时等待进行中的请求完成的最长时间（秒）
+DAEMON_SHUTDOWN_TIMEOUT = float(os.environ.get('MONITOR_SHUTDOWN_TIMEOUT', '30'))
+
+# 自适应轮询：按各账号的发帖速率分配轮询间隔和获取条数，总请求数不超过每小时预算
+ADAPTIVE_ENABLED = os.environ.get('MONITOR_ADAPTIVE', 'true').lower() in ('1', 'true', 'yes')
+REQUEST_BUDGET = float(os.environ.get('MONITOR_REQUEST_BUDGET', '120'))
+TARGET_TWEETS_PER_POLL = float(os.environ.get('MONITOR_TARGET_TWEETS_PER_POLL', '5'))
+MIN_POLL_INTERVAL = float(os.environ.get('MONITOR_MIN_POLL_INTERVAL', '120'))
+MAX_POLL_INTERVAL = float(os.environ.get('MONITOR_MAX_POLL_INTERVAL', '21600'))
+MIN_PAGE_SIZE = int(os.environ.get('MONITOR_MIN_PAGE_SIZE', '5'))
+MAX_PAGE_SIZE = int(os.environ.get('MONITOR_MAX_PAGE_SIZE', '100'))
+RATE_STATE_FILE = os.environ.get('MONITOR_RATE_STATE', os.path.join(STATE_DIR, 'posting_rates.json'))
+
 class TwitterAccountMonitor:
     """Twitter账号监控器 - 使用统一客户端"""
     
@@ -36,30 +63,35 @@ class TwitterAccountMonitor:
         self.client = UnifiedTwitterClient()
         print("✅ 统一Twitter客户端已初始化")
     
-    async def get_user_tweets_async(self, username: str, max_results: int = 10) -> List[Dict]:
-        """异步获取指定用户的最新推文"""
-        return await self.client.get_user_tweets(username, max_results)
+    async def get_user_tweets_async(self, username: str, max_results: int = 10,
+                                    raise_on_failure: bool = False) -> List[Dict]:
+        """异步获取指定用户的最新推文，raise_on_failure=True 时获取失败抛出异常而不是返回空列表"""
+        return await self.client.get_user_tweets(username, max_results, raise_on_failure=raise_on_failure)
     
     def get_user_tweets(self, username: str, max_results: int = 10) -> List[Dict]:
         """获取指定用户的最新推文（同步版本）"""
-        return asyncio.run(self.get_user_tweets_async(username, max_results))
+        return run_sync(self.get_user_tweets_async(username, max_results))
     
-    async def get_all_monitored_tweets_async(self, accounts: List[str]) -> Dict[str, List[Dict]]:
-        """异步获取所有监控账号的推文"""
-        return await get_all_monitored_tweets_sync(self.client, accounts)
+    async def get_all_monitored_tweets_async(self, accounts: List[str], page_sizes: Dict[str, int] = None,
+                                             failed: set = None) -> Dict[str, List[Dict]]:
+        """异步获取所有监控账号的推文，获取失败的账号加入 failed"""
+        return await get_all_monitored_tweets_async(self.client, accounts, page_sizes=page_sizes, failed=failed)
     
-    def get_all_monitored_tweets(self, accounts: List[str]) -> Dict[str, List[Dict]]:
+    def get_all_monitored_tweets(self, accounts: List[str], page_sizes: Dict[str, int] = None,
+                                 failed: set = None) -> Dict[str, List[Dict]]:
         """获取所有监控账号的推文（同步版本）"""
-        return get_all_monitored_tweets_sync(self.client, accounts)
+        return get_all_monitored_tweets_sync(self.client, accounts, page_sizes=page_sizes, failed=failed)
     
-    def filter_recent_tweets(self, tweets: List[Dict], hours: int = 24) -> List[Dict]:
-        """过滤最近指定小时内的推文"""
-        return self.client.filter_recent_tweets(tweets, hours)
+    def filter_recent_tweets(self, tweets: List[Dict], hours: int = 24, ordered: bool = False) -> List[Dict]:
+        """过滤最近指定小时内的推文，ordered=True 表示单个账号从新到旧的时间线"""
+        return self.client.filter_recent_tweets(tweets, hours, ordered)
 
 class ContentGenerator:
     """内容生成器"""
     
     def __init__(self, api_key: str, backup_api_key: str = None, backup_base_url: str = None):
+        # openai导入较慢，只在真正生成内容时加载
+        import openai
         self.primary_client = openai.OpenAI(api_key=api_key) if api_key else None
         self.backup_client = None
         
@@ -269,9 +301,10 @@ class HugoPublisher:
             posts_dir = self.content_dir / lang / 'posts'
             posts_dir.mkdir(parents=True, exist_ok=True)
     
-    def publish_raw_tweets_article(self, tweets_data: Dict[str, List[Dict]], language: str):
-        """发布原始推文内容文章"""
-        date = datetime.now()
+    def publish_raw_tweets_article(self, tweets_data: Dict[str, List[Dict]], language: str,
+                                   date: datetime = None):
+        """发布原始推文内容文章（同一天重复发布会覆盖当天的汇总）"""
+        date = date or datetime.now()
         
         if language == 'zh':
             title = f"今日监控账号推文汇总 - {date.strftime('%Y年%m月%d日')}"
@@ -400,9 +433,9 @@ This article only summarizes public Twitter tweet content and does not represent
         
         print(f"✅ {language.upper()}原始推文文章已发布: {filepath}")
     
-    def publish_analysis_article(self, article: Dict):
+    def publish_analysis_article(self, article: Dict, date: datetime = None):
         """发布分析文章"""
-        date = datetime.now()
+        date = date or datetime.now()
         language = article['language']
         
         # 创建文件名
@@ -488,20 +521,353 @@ categories = ['{"市场分析" if language == "zh" else "Market Analysis"}']
         
         print(f"✅ {language.upper()}分析文章已发布: {filepath}")
 
+class AdaptivePollScheduler:
+    """
+    根据历史估计每个账号的发帖速率（条/小时，指数加权平均）
+    高产账号轮询更频繁、每次取更多条，安静账号很少轮询，整体请求数受每小时预算约束
+    """
+    
+    SMOOTHING = 0.3
+    MIN_RATE = 0.01
+    # 获取条数按预期新推文数留出的余量
+    PAGE_HEADROOM = 1.5
+    
+    def __init__(self, accounts: List[str], path: str = RATE_STATE_FILE, budget: float = REQUEST_BUDGET):
+        self.accounts = normalize_accounts(accounts)
+        self.path = path
+        self.budget = budget
+        # 未观测过的账号按默认轮询间隔内产生目标条数估计
+        self.default_rate = TARGET_TWEETS_PER_POLL * 3600 / POLL_INTERVAL
+        self.stats = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.stats = json.load(f)
+            except Exception as e:
+                print(f"⚠️  发帖速率文件加载失败，使用默认速率: {e}")
+    
+    def rate(self, account: str) -> float:
+        stats = self.stats.get(account)
+        return stats['rate'] if stats else self.default_rate
+    
+    def _sample_from_timestamps(self, tweets: List[Dict]) -> Optional[float]:
+        """首次观测时用本页推文的时间跨度估计速率"""
+        times = [created_ts for created_ts in map(tweet_timestamp, tweets) if created_ts]
+        if len(times) < 2:
+            return None
+        span_hours = max(max(times) - min(times), 900) / 3600
+        return (len(times) - 1) / span_hours
+    
+    def observe(self, account: str, tweets: List[Dict], page_size: int, now: float = None) -> int:
+        """记录一次获取结果，返回新推文条数并更新速率估计"""
+        now = now or time.time()
+        stats = self.stats.get(account)
+        last_id = int(stats['last_id']) if stats and stats.get('last_id') else 0
+        ids = [int(tweet.get('id') or 0) for tweet in tweets if str(tweet.get('id') or '').isdigit()]
+        new_count = sum(1 for tweet_id in ids if tweet_id > last_id)
+        
+        if stats is None:
+            sample = self._sample_from_timestamps(tweets)
+            rate = sample if sample is not None else self.default_rate
+        else:
+            elapsed_hours = max(now - stats['observed_at'], 60) / 3600
+            sample = new_count / elapsed_hours
+            if tweets and new_count >= page_size:
+                # 整页都是新推文说明还有更多没取到，速率被低估
+                sample *= 2
+            rate = (1 - self.SMOOTHING) * stats['rate'] + self.SMOOTHING * sample
+        
+        self.stats[account] = {
+            'rate': max(rate, self.MIN_RATE),
+            'last_id': str(max(ids + [last_id])),
+            'observed_at': now,
+        }
+        return new_count
+    
+    def intervals(self) -> Dict[str, float]:
+        """
+        每个账号的轮询间隔（秒）：按目标新推文数计算并限制在上下限内
+        总请求数超出预算时按比例放大所有间隔
+        """
+        desired = {
+            account: min(max(TARGET_TWEETS_PER_POLL / self.rate(account) * 3600, MIN_POLL_INTERVAL),
+                         MAX_POLL_INTERVAL)
+            for account in self.accounts
+        }
+        demand = sum(3600 / interval for interval in desired.values())
+        factor = max(1.0, demand / self.budget) if self.budget > 0 else 1.0
+        return {account: interval * factor for account, interval in desired.items()}
+    
+    def interval(self, account: str) -> float:
+        return self.intervals()[account]
+    
+    def page_size(self, account: str, interval: float = None) -> int:
+        """按间隔内预期的新推文数决定获取条数"""
+        if interval is None:
+            interval = self.interval(account)
+        expected = self.rate(account) * interval / 3600
+        return min(max(math.ceil(expected * self.PAGE_HEADROOM) + 1, MIN_PAGE_SIZE), MAX_PAGE_SIZE)
+    
+    def page_sizes_since_last_run(self, now: float = None) -> Dict[str, int]:
+        """单次运行模式：按距上次观测的时间决定各账号获取条数"""
+        now = now or time.time()
+        sizes = {}
+        for account in self.accounts:
+            stats = self.stats.get(account)
+            if stats:
+                sizes[account] = self.page_size(account, now - stats['observed_at'])
+        return sizes
+    
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.stats, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+    
+    def report(self):
+        """打印各账号的速率估计和分配结果"""
+        intervals = self.intervals()
+        for account in self.accounts:
+            print(f"   @{account}: {self.rate(account):.2f} 条/小时 -> 每 {intervals[account] / 60:.0f} 分钟，"
+                  f"每次 {self.page_size(account, intervals[account])} 条")
+
+class MonitorDaemon:
+    """
+    常驻监控：单个调度器按各账号自己的间隔轮询，保持客户端（连接池、登录会话）常驻
+    新推文增量合并进当天的原始推文汇总，跨天时为前一天生成分析文章
+    """
+    
+    def __init__(self, monitor: TwitterAccountMonitor, generator: ContentGenerator,
+                 publisher: HugoPublisher, accounts: List[str], state_file: str = DAEMON_STATE_FILE,
+                 scheduler: AdaptivePollScheduler = None):
+        self.monitor = monitor
+        self.scheduler = scheduler
+        self.generator = generator
+        self.publisher = publisher
+        self.accounts = normalize_accounts(accounts)
+        self.state_file = state_file
+        self.intervals = {
+            account: POLL_INTERVALS.get(account.lstrip('@').lower(), POLL_INTERVAL) for account in self.accounts
+        }
+        self.next_poll = {}
+        self.digest_date = datetime.now().strftime('%Y-%m-%d')
+        self.digest = {}
+        self._stop = None
+        
+        # 常驻模式必须增量获取，否则每次轮询都会重复拉取同一批推文
+        if self.monitor.client.watermarks is None:
+            self.monitor.client.watermarks = HighWaterMarks(WATERMARK_FILE)
+        self._load_checkpoint()
+    
+    def _load_checkpoint(self):
+        """恢复上次退出时的当天汇总和轮询时间"""
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"⚠️  常驻状态文件加载失败，从头开始: {e}")
+            return
+        self.next_poll = {a: t for a, t in state.get('next_poll', {}).items() if a in self.intervals}
+        # 上次退出后若已跨天，前一天的汇总会在第一轮调度时补发分析文章
+        self.digest_date = state.get('date', self.digest_date)
+        self.digest = state.get('digest', {})
+        print(f"♻️  已恢复常驻状态: {self.digest_date} 的 {sum(len(t) for t in self.digest.values())} 条推文")
+    
+    def checkpoint(self):
+        """保存当天汇总、下次轮询时间和发帖速率估计"""
+        if self.scheduler is not None:
+            self.scheduler.save()
+        directory = os.path.dirname(self.state_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'date': self.digest_date,
+                'digest': self.digest,
+                'next_poll': self.next_poll,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_file, self.state_file)
+    
+    def interval(self, account: str, new_count: int) -> float:
+        """账号的下次轮询间隔（秒）：显式配置的间隔优先，其次按发帖速率自适应"""
+        if self.scheduler is None or account.lstrip('@').lower() in POLL_INTERVALS:
+            return self.intervals[account]
+        return self.scheduler.interval(account)
+    
+    def page_size(self, account: str) -> int:
+        """账号每次获取的条数"""
+        if self.scheduler is None:
+            return 10
+        return self.scheduler.page_size(account, self.interval(account, 0))
+    
+    def _merge(self, account: str, tweets: List[Dict]) -> int:
+        """按id合并进当天汇总，返回新增条数"""
+        existing = self.digest.setdefault(account, [])
+        seen = {tweet.get('id') for tweet in existing}
+        added = 0
+        for tweet in tweets:
+            if tweet.get('id') not in seen:
+                record = tweet.to_dict() if hasattr(tweet, 'to_dict') else dict(tweet)
+                existing.append(record)
+                seen.add(record.get('id'))
+                added += 1
+        if not existing:
+            del self.digest[account]
+        return added
+    
+    def _publish_digest(self):
+        """重写当天的原始推文汇总（双语）"""
+        # 按汇总所属的日期发布，跨午夜后、换日之前完成的轮询不会写进新一天的文件
+        date = datetime.strptime(self.digest_date, '%Y-%m-%d')
+        for language in ('zh', 'en'):
+            self.publisher.publish_raw_tweets_article(self.digest, language, date=date)
+    
+    async def _roll_day(self):
+        """跨天时为前一天的汇总生成分析文章，然后开始新的一天"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        if today == self.digest_date:
+            return
+        if self.digest:
+            print(f"\n🗓️  {self.digest_date} 结束，生成当天分析文章...")
+            day_end = datetime.strptime(self.digest_date, '%Y-%m-%d').replace(hour=23, minute=59)
+            for language in ('zh', 'en'):
+                article = await asyncio.to_thread(self.generator.generate_analysis_article, self.digest, language)
+                self.publisher.publish_analysis_article(article, date=day_end)
+        self.digest_date = today
+        self.digest = {}
+        self.checkpoint()
+    
+    async def poll(self, account: str):
+        """轮询一个账号，新推文写入当天汇总；无论成功与否都安排下次轮询"""
+        added = 0
+        try:
+            page_size = self.page_size(account)
+            try:
+                tweets = await self.monitor.get_user_tweets_async(account, page_size, raise_on_failure=True)
+            except Exception as e:
+                print(f"❌ @{account} 轮询失败: {e}")
+                tweets = None
+            # 获取失败不代表没有新推文，不计入发帖速率
+            if tweets is not None and self.scheduler is not None:
+                self.scheduler.observe(account, tweets, page_size)
+            tweets = tweets or []
+            
+            recent = self.monitor.filter_recent_tweets(tweets, hours=24, ordered=True) if tweets else []
+            added = self._merge(account, recent)
+            if added:
+                print(f"🆕 @{account}: 新增 {added} 条推文")
+                self._publish_digest()
+                # 汇总写入后再保存高水位，与单次运行的顺序一致
+                self.monitor.client.save_watermarks()
+        except Exception as e:
+            print(f"❌ @{account} 处理失败: {type(e).__name__}: {e}")
+        finally:
+            # 出错时也推迟下次轮询，避免调度循环对同一账号空转
+            try:
+                interval = self.interval(account, added)
+            except Exception as e:
+                print(f"⚠️  @{account} 轮询间隔计算失败，使用默认间隔: {e}")
+                interval = self.intervals.get(account, POLL_INTERVAL)
+            self.next_poll[account] = time.time() + interval
+            try:
+                self.checkpoint()
+            except OSError as e:
+                print(f"⚠️  常驻状态保存失败: {e}")
+    
+    def request_stop(self):
+        """请求优雅退出"""
+        if self._stop is not None and not self._stop.is_set():
+            print("\n🛑 收到退出信号，等待进行中的请求完成...")
+            self._stop.set()
+    
+    async def run(self):
+        """调度循环：到期的账号并发轮询，每个账号同时最多一个请求"""
+        loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.request_stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+        
+        now = time.time()
+        for account in self.accounts:
+            self.next_poll.setdefault(account, now)
+        print(f"🔁 常驻监控已启动: {len(self.accounts)} 个账号")
+        
+        in_flight = {}
+        stopping = asyncio.ensure_future(self._stop.wait())
+        while not self._stop.is_set():
+            await self._roll_day()
+            
+            now = time.time()
+            for account in self.accounts:
+                if account not in in_flight and self.next_poll[account] <= now:
+                    in_flight[account] = asyncio.ensure_future(self.poll(account))
+            
+            # 等到最早到期的账号、任一请求完成或收到退出信号
+            idle = [self.next_poll[a] for a in self.accounts if a not in in_flight]
+            timeout = max(0.0, min(idle) - time.time()) if idle else None
+            await asyncio.wait(set(in_flight.values()) | {stopping}, timeout=timeout,
+                               return_when=asyncio.FIRST_COMPLETED)
+            for account, task in list(in_flight.items()):
+                if task.done():
+                    del in_flight[account]
+        
+        # 优雅退出：等待进行中的请求，写入汇总、高水位和调度状态
+        if in_flight:
+            _, pending = await asyncio.wait(in_flight.values(), timeout=DAEMON_SHUTDOWN_TIMEOUT)
+            for task in pending:
+                task.cancel()
+        if self.digest:
+            self._publish_digest()
+        self.monitor.client.save_watermarks()
+        self.checkpoint()
+        await self.monitor.client.aclose()
+        print("✅ 常驻监控已退出，状态已保存")
+
+def run_daemon(monitor: TwitterAccountMonitor, generator: ContentGenerator, publisher: HugoPublisher):
+    """以常驻模式运行监控"""
+    # 调度器和常驻循环共用同一份规范化后的账号列表
+    scheduler = AdaptivePollScheduler(TWT_ACCOUNTS) if ADAPTIVE_ENABLED else None
+    if scheduler is not None:
+        print("📈 自适应轮询计划:")
+        scheduler.report()
+    daemon = MonitorDaemon(monitor, generator, publisher, TWT_ACCOUNTS, scheduler=scheduler)
+    try:
+        asyncio.run(daemon.run())
+    except KeyboardInterrupt:
+        # 不支持信号处理器的平台上Ctrl+C直接中断，仍然保存状态
+        daemon.monitor.client.save_watermarks()
+        daemon.checkpoint()
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='Twitter账号监控')
+    parser.add_argument('--daemon', action='store_true', help='常驻运行，按账号间隔持续轮询')
+    args = parser.parse_args()
+    
     print("🚀 开始监控账号推文...")
     
     # 检查环境变量
-    if not TWT_ACCOUNTS or TWT_ACCOUNTS == ['']:
+    if not TWT_ACCOUNTS:
         print("❌ 错误：请在.env文件中设置TWT_ACCOUNTS")
         return
     
     # 检查是否有任何可用的Twitter API配置
     has_twitter_api = bool(TWITTER_API_KEY)
-    has_twikit_config = bool(os.environ.get('TWITTER_USERNAME') and os.environ.get('TWITTER_PASSWORD'))
+    has_twikit_config = bool(load_twikit_credentials())
+    # 回放录像不访问网络，不需要凭据
+    cassette = shared_cassette()
+    replaying = cassette is not None and cassette.replaying
     
-    if not has_twitter_api and not has_twikit_config:
+    if not has_twitter_api and not has_twikit_config and not replaying:
         print("❌ 错误：请配置Twitter API密钥或Twikit登录凭据")
         print("   TwitterAPI.io: 设置 TWITTER_API_KEY")
         print("   Twikit: 设置 TWITTER_USERNAME, TWITTER_PASSWORD, TWITTER_EMAIL")
@@ -511,7 +877,7 @@ def main():
     if has_twitter_api:
         print("✅ TwitterAPI.io 已配置")
     if has_twikit_config:
-        print("✅ Twikit 已配置")
+        print(f"✅ Twikit 已配置（{len(load_twikit_credentials())} 个账号）")
     
     # 初始化组件
     monitor = TwitterAccountMonitor()
@@ -522,19 +888,37 @@ def main():
     )
     publisher = HugoPublisher(CONTENT_DIR)
     
+    if args.daemon:
+        run_daemon(monitor, generator, publisher)
+        return
+    
     # 获取所有监控账号的推文
     print("\n🔍 获取监控账号推文...")
-    all_tweets = monitor.get_all_monitored_tweets(TWT_ACCOUNTS)
+    # 按各账号的发帖速率决定本次获取条数
+    scheduler = AdaptivePollScheduler(TWT_ACCOUNTS) if ADAPTIVE_ENABLED else None
+    page_sizes = scheduler.page_sizes_since_last_run() if scheduler is not None else None
+    failed = set()
+    all_tweets = monitor.get_all_monitored_tweets(TWT_ACCOUNTS, page_sizes=page_sizes, failed=failed)
+    if scheduler is not None:
+        # 获取失败的账号不更新发帖速率，避免故障期间把间隔推向上限
+        for account in scheduler.accounts:
+            if account not in failed:
+                scheduler.observe(account, all_tweets.get(account, []), page_sizes.get(account, 10))
+        # 立即保存，没有新推文提前结束时速率衰减和观测时间也要保留
+        scheduler.save()
     
     if not all_tweets:
-        print("❌ 未能获取到任何推文")
+        if monitor.client.watermarks is not None:
+            print("📭 所有监控账号都没有新推文")
+        else:
+            print("❌ 未能获取到任何推文")
         return
     
     # 过滤最近24小时的推文
     print("\n⏰ 过滤最近24小时的推文...")
     recent_tweets = {}
     for account, tweets in all_tweets.items():
-        recent = monitor.filter_recent_tweets(tweets, hours=24)
+        recent = monitor.filter_recent_tweets(tweets, hours=24, ordered=True)
         if recent:
             recent_tweets[account] = recent
             print(f"   @{account}: {len(recent)} 条最新推文")
@@ -561,6 +945,9 @@ def main():
     en_analysis = generator.generate_analysis_article(recent_tweets, 'en')
     publisher.publish_analysis_article(en_analysis)
     
+    # 内容发布完成后再保存高水位，中途失败时下次会重新获取
+    monitor.client.save_watermarks()
+    
     print("\n✅ 账号监控内容生成完成！")
 
 if __name__ == "__main__":
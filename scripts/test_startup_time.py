@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+测试内容脚本的启动耗时
+基于 python -X importtime 统计各模块的导入时间，超出预算或提前导入重依赖时返回非零退出码
+"""
+
+import os
+import sys
+import subprocess
+import statistics
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+SCRIPTS_DIR = Path(__file__).parent
+
+# 各入口模块的导入耗时预算（毫秒），可用 STARTUP_BUDGET_SCALE 整体放宽（如较慢的CI机器）
+STARTUP_BUDGETS = {
+    'twitter_client': 250,
+    'generate_content': 300,
+    'monitor_accounts': 300,
+}
+BUDGET_SCALE = float(os.environ.get('STARTUP_BUDGET_SCALE', '1.0'))
+RUNS = int(os.environ.get('STARTUP_RUNS', '5'))
+
+# 只应在首次使用时才导入的重依赖
+LAZY_MODULES = ('openai', 'requests', 'twikit', 'dotenv', 'numpy', 'httpx', 'orjson', 'ijson')
+# 存在 .env 时 load_env() 按设计会导入python-dotenv，此时不把它算作提前导入
+ENV_FILES = (SCRIPTS_DIR / '.env', SCRIPTS_DIR.parent / '.env')
+
+def measure_import(module: str) -> Tuple[float, List[str]]:
+    """在新进程中导入模块，返回 (累计导入耗时毫秒, 被导入的模块名列表)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SCRIPTS_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    
+    total_us = None
+    imported = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|', 2)
+        name = name.strip()
+        if not cumulative.strip().isdigit():
+            continue
+        imported.append(name)
+        if name == module:
+            total_us = int(cumulative)
+    return (total_us or 0) / 1000, imported
+
+def check_module(module: str, budget_ms: float) -> bool:
+    """多次测量取中位数，与预算比较并检查重依赖是否被提前导入"""
+    timings = []
+    imported = []
+    for _ in range(RUNS):
+        elapsed, imported = measure_import(module)
+        timings.append(elapsed)
+    median = statistics.median(timings)
+    
+    lazy = set(LAZY_MODULES)
+    if any(path.exists() for path in ENV_FILES):
+        lazy.discard('dotenv')
+    eager = sorted({name.split('.')[0] for name in imported} & lazy)
+    ok = median <= budget_ms and not eager
+    status = '✅' if ok else '❌'
+    print(f"{status} {module:<18} 中位数 {median:7.1f}ms  预算 {budget_ms:.0f}ms  最大 {max(timings):.1f}ms")
+    if eager:
+        print(f"   ⚠️  启动时导入了应延迟加载的模块: {', '.join(eager)}")
+    return ok
+
+def main() -> bool:
+    print("🧪 测试启动耗时 (python -X importtime)...")
+    budgets: Dict[str, float] = {module: ms * BUDGET_SCALE for module, ms in STARTUP_BUDGETS.items()}
+    
+    results = []
+    for module, budget in budgets.items():
+        try:
+            results.append(check_module(module, budget))
+        except Exception as e:
+            print(f"❌ {module} 导入失败: {e}")
+            results.append(False)
+    
+    passed = sum(results)
+    print(f"总计: {passed}/{len(results)} 通过")
+    return passed == len(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -5,43 +5,950 @@ Twitter客户端 - 支持多种API方案
 """
 
 import os
+import gzip
 import json
-import requests
+import hashlib
+import heapq
+import importlib
+import re
+import sys
+import time
+import threading
 import asyncio
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from dotenv import load_dotenv
+import atexit
+from array import array
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+
+# 可选依赖：httpx（异步连接池 + keep-alive + HTTP/2）、ijson（流式解析推文数组）、
+# orjson（一次性快速解析）、numpy（批量过滤），都在首次使用时才导入
+_optional_modules = {}
+
+def _load_optional(name: str):
+    """首次使用时导入可选依赖，未安装时返回None"""
+    module = _optional_modules.get(name)
+    if module is None:
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            module = False
+        _optional_modules[name] = module
+    return module or None
+
+def load_env():
+    """
+    加载 .env 中的环境变量
+    只有存在 .env 文件时才导入python-dotenv，CI中直接使用环境变量时不付出导入开销
+    """
+    for directory in (Path(__file__).parent, Path(__file__).parent.parent):
+        env_file = directory / '.env'
+        if env_file.exists():
+            from dotenv import load_dotenv
+            load_dotenv(env_file)
+            return
 
 # 加载环境变量
-load_dotenv()
+load_env()
+
+# 本地状态目录（高水位、缓存、会话等），默认在仓库根目录下的 .state/
+STATE_DIR = os.environ.get('TWITTER_STATE_DIR', str(Path(__file__).parent.parent / '.state'))
+
+# HTTP传输配置（TWITTER_API_BASE_URL可指向本地模拟服务器做压测）
+API_BASE_URL = os.environ.get('TWITTER_API_BASE_URL', 'https://api.twitterapi.io/twitter')
+HTTP_TIMEOUT = float(os.environ.get('TWITTER_API_TIMEOUT', '30'))
+HTTP_MAX_CONNECTIONS = int(os.environ.get('TWITTER_API_MAX_CONNECTIONS', '100'))
+HTTP_MAX_KEEPALIVE = int(os.environ.get('TWITTER_API_MAX_KEEPALIVE', '20'))
+HTTP2_ENABLED = os.environ.get('TWITTER_API_HTTP2', '').lower() in ('1', 'true', 'yes')
+
+# 响应JSON解码后端：auto | ijson | orjson | json
+# auto 时超过 JSON_STREAM_MIN_BYTES 的响应用ijson流式解码（省内存），其余用orjson/json（更快）
+JSON_BACKEND = os.environ.get('TWITTER_JSON_BACKEND', 'auto').lower()
+JSON_STREAM_MIN_BYTES = int(os.environ.get('TWITTER_JSON_STREAM_MIN_BYTES', str(1024 * 1024)))
+
+# 按时间过滤的推文数达到该值时改用批量过滤（安装numpy时向量化比较）
+BULK_FILTER_MIN = int(os.environ.get('TWITTER_BULK_FILTER_MIN', '2000'))
+
+# 并发配置：全局扇出并发数 + 各数据源并发上限
+FETCH_CONCURRENCY = int(os.environ.get('TWITTER_FETCH_CONCURRENCY', '10'))
+PROVIDER_CONCURRENCY = {
+    'twitterapi': int(os.environ.get('TWITTERAPI_CONCURRENCY', '10')),
+    'twikit': int(os.environ.get('TWIKIT_CONCURRENCY', '2')),
+}
+
+# 对冲请求配置：TwitterAPI超过历史p95延迟仍未返回时并发请求Twikit
+HEDGE_ENABLED = os.environ.get('TWITTER_HEDGE', '').lower() in ('1', 'true', 'yes')
+HEDGE_PERCENTILE = float(os.environ.get('TWITTER_HEDGE_PERCENTILE', '0.95'))
+HEDGE_DELAY = float(os.environ.get('TWITTER_HEDGE_DELAY', '3'))
+HEDGE_MIN_DELAY = float(os.environ.get('TWITTER_HEDGE_MIN_DELAY', '0.5'))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 200
+
+# 熔断器配置：连续失败次数阈值、冷却时间，可选状态文件用于跨进程保留
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('TWITTER_BREAKER_THRESHOLD', '5'))
+BREAKER_RECOVERY_TIMEOUT = float(os.environ.get('TWITTER_BREAKER_COOLDOWN', '120'))
+BREAKER_STATE_FILE = os.environ.get('TWITTER_BREAKER_STATE_FILE', '')
+
+# 限流配置：每个数据源的令牌速率（每秒请求数）和突发容量，按端点分别计数
+RATE_LIMITS = {
+    'twitterapi': (float(os.environ.get('TWITTERAPI_RATE_LIMIT', '10')),
+                   int(os.environ.get('TWITTERAPI_RATE_BURST', '10'))),
+    # Twikit默认 50次/15分钟
+    'twikit': (float(os.environ.get('TWIKIT_RATE_LIMIT', str(50 / 900))),
+               int(os.environ.get('TWIKIT_RATE_BURST', '5'))),
+}
+RATE_LIMIT_MAX_WAIT = float(os.environ.get('RATE_LIMIT_MAX_WAIT', '60'))
+RATE_LIMIT_RETRIES = int(os.environ.get('RATE_LIMIT_RETRIES', '2'))
+RATE_LIMIT_BACKOFF = 5.0
+
+# 请求合并：并发的相同请求共享同一个进行中的请求
+COALESCE_ENABLED = os.environ.get('TWITTER_COALESCE', 'true').lower() in ('1', 'true', 'yes')
+
+# 增量获取配置：记录每个账号/查询已获取到的最新推文，下次只请求更新的推文
+INCREMENTAL_ENABLED = os.environ.get('TWITTER_INCREMENTAL', '').lower() in ('1', 'true', 'yes')
+WATERMARK_FILE = os.environ.get('TWITTER_WATERMARK_FILE', os.path.join(STATE_DIR, 'high_water_marks.json'))
+
+# 响应缓存配置：各端点TTL（秒），过期条目保留 max_age 用于ETag重新验证
+HTTP_CACHE_ENABLED = os.environ.get('TWITTER_HTTP_CACHE', '').lower() in ('1', 'true', 'yes')
+HTTP_CACHE_DIR = os.environ.get('TWITTER_HTTP_CACHE_DIR', os.path.join(STATE_DIR, 'http_cache'))
+HTTP_CACHE_TTLS = {
+    '/user/tweets': float(os.environ.get('TWITTER_CACHE_TTL_USER_TWEETS', '3600')),
+    '/tweet/advanced_search': float(os.environ.get('TWITTER_CACHE_TTL_SEARCH', '3600')),
+}
+HTTP_CACHE_MAX_AGE = 86400
+
+# Twikit会话持久化：保存登录cookies，在信任期内直接复用，超过后先轻量验证
+TWIKIT_SESSION_DIR = os.environ.get('TWIKIT_SESSION_DIR', STATE_DIR)
+TWIKIT_SESSION_TRUST = float(os.environ.get('TWIKIT_SESSION_TRUST', '21600'))
+
+# 用户名→用户id缓存：正常条目默认30天，不存在的账号默认1天后重新确认
+USER_CACHE_FILE = os.environ.get('TWIKIT_USER_CACHE_FILE', os.path.join(STATE_DIR, 'twikit_users.json'))
+USER_CACHE_TTL = float(os.environ.get('TWIKIT_USER_CACHE_TTL', str(30 * 86400)))
+USER_CACHE_NEGATIVE_TTL = float(os.environ.get('TWIKIT_USER_CACHE_NEGATIVE_TTL', '86400'))
+
+# 搜索查询合并：单条查询的最大长度和最多关键词数
+SEARCH_QUERY_MAX_LENGTH = int(os.environ.get('SEARCH_QUERY_MAX_LENGTH', '512'))
+SEARCH_QUERY_MAX_TERMS = int(os.environ.get('SEARCH_QUERY_MAX_TERMS', '20'))
+# 单次搜索请求最多返回的条数（TwitterAPI.io一页上限）
+SEARCH_PAGE_MAX_RESULTS = 100
+
+# 录制/回放：record 把数据源响应录入录像文件，replay 从录像回放（不访问网络）
+# 回放速度倍数：1按原始耗时等待，0不等待
+# 默认每个入口脚本一个录像文件，同一工作流中先后录制的脚本不会互相覆盖
+_SCRIPT_NAME = Path(sys.argv[0]).stem if sys.argv and sys.argv[0] not in ('', '-c') else 'python'
+CASSETTE_MODE = os.environ.get('TWITTER_CASSETTE_MODE', '').lower()
+CASSETTE_FILE = os.environ.get('TWITTER_CASSETTE', os.path.join(STATE_DIR, f'cassette-{_SCRIPT_NAME}.jsonl.gz'))
+CASSETTE_SPEED = float(os.environ.get('TWITTER_CASSETTE_SPEED', '1'))
+
+# Twikit账号池：被风控/锁定的账号隔离时长，被限流且未给出重置时间时的隔离时长
+TWIKIT_QUARANTINE = float(os.environ.get('TWIKIT_QUARANTINE_SECONDS', '3600'))
+TWIKIT_RATE_LIMIT_QUARANTINE = float(os.environ.get('TWIKIT_RATE_LIMIT_QUARANTINE_SECONDS', '900'))
+
+def _http2_available() -> bool:
+    """检查HTTP/2依赖(h2)是否可用"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class RateLimitExceeded(Exception):
+    """需要等待的时间超过上限，放弃本次请求"""
+    
+    def __init__(self, key: str, wait: float):
+        super().__init__(f"{key} 限流，需要等待 {wait:.1f}s")
+        self.key = key
+        self.wait = wait
+
+class TokenBucket:
+    """
+    预约式令牌桶：每个调用者先预约令牌再按预约时间等待，
+    天然按先来后到排队，且不依赖具体事件循环
+    """
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self, max_wait: float) -> float:
+        """预约一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            # updated 可能被限流惩罚推到未来，此时不补充令牌
+            if now > self.updated:
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+            
+            self.tokens -= 1
+            wait = max(0.0, self.updated - now)
+            if self.tokens < 0:
+                wait += -self.tokens / self.rate
+            
+            if wait > max_wait:
+                self.tokens += 1
+                raise RateLimitExceeded('', wait)
+            return wait
+    
+    def block(self, delay: float):
+        """服务端要求退避：delay 秒内不再发放令牌"""
+        with self._lock:
+            self.updated = max(self.updated, time.monotonic() + delay)
+            self.tokens = min(self.tokens, 0.0)
+
+class RateLimiter:
+    """按端点划分令牌桶的共享限流器，识别 Retry-After / x-rate-limit-reset"""
+    
+    def __init__(self, limits: Dict = None, max_wait: float = RATE_LIMIT_MAX_WAIT):
+        self.limits = limits or RATE_LIMITS
+        self.max_wait = max_wait
+        self.buckets = {}
+        self._lock = threading.Lock()
+    
+    def bucket(self, key: str) -> TokenBucket:
+        """获取端点对应的令牌桶，key格式为 '数据源:端点'"""
+        with self._lock:
+            if key not in self.buckets:
+                rate, burst = self.limits.get(key.split(':', 1)[0], (1.0, 1))
+                self.buckets[key] = TokenBucket(rate, burst)
+            return self.buckets[key]
+    
+    def _reserve(self, key: str) -> float:
+        try:
+            return self.bucket(key).reserve(self.max_wait)
+        except RateLimitExceeded as e:
+            raise RateLimitExceeded(key, e.wait)
+    
+    async def acquire(self, key: str):
+        """异步等待令牌"""
+        wait = self._reserve(key)
+        if wait > 0:
+            await asyncio.sleep(wait)
+    
+    def acquire_sync(self, key: str):
+        """同步等待令牌"""
+        wait = self._reserve(key)
+        if wait > 0:
+            time.sleep(wait)
+    
+    def update_from_headers(self, key: str, headers, status_code: int) -> float:
+        """根据响应头更新限流状态，返回需要退避的秒数"""
+        delay = 0.0
+        retry_after = headers.get('Retry-After')
+        reset = headers.get('x-rate-limit-reset')
+        remaining = headers.get('x-rate-limit-remaining')
+        
+        if retry_after:
+            delay = _parse_retry_after(retry_after)
+        elif reset and (status_code == 429 or remaining == '0'):
+            try:
+                delay = max(0.0, float(reset) - time.time())
+            except ValueError:
+                pass
+        
+        if status_code == 429 and delay <= 0:
+            delay = RATE_LIMIT_BACKOFF
+        if delay > 0:
+            self.bucket(key).block(delay)
+        return delay
+    
+    def update_from_error(self, key: str, error: Exception) -> Optional[float]:
+        """识别限流异常（如twikit.errors.TooManyRequests），返回退避秒数；非限流异常返回None"""
+        status_code = getattr(error, 'status_code', None)
+        if status_code is None:
+            status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+        if type(error).__name__ != 'TooManyRequests' and status_code != 429:
+            return None
+        
+        reset = getattr(error, 'rate_limit_reset', None)
+        if reset:
+            delay = max(0.0, float(reset) - time.time())
+            self.bucket(key).block(delay)
+            return delay
+        headers = getattr(error, 'headers', None) or getattr(getattr(error, 'response', None), 'headers', None) or {}
+        return self.update_from_headers(key, headers, 429)
+
+def _parse_retry_after(value: str) -> float:
+    """解析 Retry-After（秒数或HTTP日期）"""
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return RATE_LIMIT_BACKOFF
+
+# 所有客户端共享的限流器
+rate_limiter = RateLimiter()
+
+class ResponseCache:
+    """
+    TwitterAPI响应的磁盘缓存，按端点+参数区分，每个端点单独设置TTL
+    过期后若有 ETag / Last-Modified 则发送条件请求重新验证
+    """
+    
+    def __init__(self, directory: str, ttls: Dict = None, max_age: float = HTTP_CACHE_MAX_AGE):
+        self.directory = directory
+        self.ttls = ttls or HTTP_CACHE_TTLS
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+    
+    def _file(self, path: str, params: Dict) -> str:
+        key = json.dumps([path, sorted((k, str(v)) for k, v in params.items())], ensure_ascii=False)
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+    
+    def _write(self, file: str, entry: Dict):
+        tmp_file = f"{file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_file, file)
+    
+    def get(self, path: str, params: Dict) -> Optional[Dict]:
+        file = self._file(path, params)
+        try:
+            with open(file, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get('stored_at', 0) > self.max_age:
+            # 太旧的条目不再用于重新验证
+            os.remove(file)
+            return None
+        return entry
+    
+    def is_fresh(self, path: str, entry: Dict) -> bool:
+        return time.time() - entry.get('stored_at', 0) < self.ttls.get(path, 0)
+    
+    def validators(self, entry: Dict) -> Dict:
+        """条件请求头"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def put(self, path: str, params: Dict, data: Dict, headers):
+        if 'no-store' in (headers.get('Cache-Control') or ''):
+            return
+        self._write(self._file(path, params), {
+            'path': path,
+            'stored_at': time.time(),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'data': data
+        })
+    
+    def refresh(self, path: str, params: Dict, entry: Dict, headers):
+        """304后刷新存储时间"""
+        entry['stored_at'] = time.time()
+        entry['etag'] = headers.get('ETag') or entry.get('etag')
+        entry['last_modified'] = headers.get('Last-Modified') or entry.get('last_modified')
+        self._write(self._file(path, params), entry)
+
+# 推文中实际用到的字段，其余字段解码时直接丢弃
+_TWEET_FIELDS = ('id', 'text', 'createdAt', 'likeCount', 'retweetCount', 'replyCount')
+_AUTHOR_FIELDS = ('id', 'name', 'userName')
+_STREAM_FIELDS = {f'tweets.item.{field}': (field, None) for field in _TWEET_FIELDS}
+_STREAM_FIELDS.update({f'tweets.item.author.{field}': ('author', field) for field in _AUTHOR_FIELDS})
+_SCALAR_EVENTS = ('string', 'number', 'boolean', 'null')
+
+def _json_backend(size: int) -> str:
+    """根据配置、响应大小和已安装的库选择JSON解码后端"""
+    if JSON_BACKEND == 'ijson' and _load_optional('ijson'):
+        return 'ijson'
+    if JSON_BACKEND == 'orjson' and _load_optional('orjson'):
+        return 'orjson'
+    if JSON_BACKEND == 'auto':
+        # 流式解码按事件逐个处理，比一次性解析慢，只在大响应上用来压低峰值内存
+        if size >= JSON_STREAM_MIN_BYTES and _load_optional('ijson'):
+            return 'ijson'
+        if _load_optional('orjson'):
+            return 'orjson'
+    return 'json'
+
+def _slim_tweet(item: Dict) -> Dict:
+    """只保留用到的推文字段"""
+    tweet = {field: item[field] for field in _TWEET_FIELDS if field in item}
+    author = item.get('author')
+    if isinstance(author, dict):
+        tweet['author'] = {field: author[field] for field in _AUTHOR_FIELDS if field in author}
+    return tweet
+
+def _stream_decode(body: bytes) -> Dict:
+    """
+    用ijson按事件流式解码：推文逐条组装，只取需要的字段，不构建完整文档树
+    顶层的标量字段（next_cursor、has_next_page、status等）原样保留
+    """
+    data = {'tweets': []}
+    tweet = None
+    for prefix, event, value in _load_optional('ijson').parse(body):
+        if prefix == 'tweets.item':
+            if event == 'start_map':
+                tweet = {}
+            elif event == 'end_map':
+                data['tweets'].append(tweet)
+                tweet = None
+        elif tweet is not None and event in _SCALAR_EVENTS and prefix in _STREAM_FIELDS:
+            field, sub_field = _STREAM_FIELDS[prefix]
+            if sub_field is None:
+                tweet[field] = value
+            else:
+                tweet.setdefault('author', {})[sub_field] = value
+        elif '.' not in prefix and prefix and event in _SCALAR_EVENTS:
+            data[prefix] = value
+    return data
+
+def decode_response(body: bytes) -> Dict:
+    """解码TwitterAPI.io响应，推文只保留用到的字段"""
+    backend = _json_backend(len(body))
+    if backend == 'ijson':
+        return _stream_decode(body)
+    data = _load_optional('orjson').loads(body) if backend == 'orjson' else json.loads(body)
+    if isinstance(data, dict) and isinstance(data.get('tweets'), list):
+        data['tweets'] = [_slim_tweet(item) for item in data['tweets'] if isinstance(item, dict)]
+    return data
+
+def _count(value) -> int:
+    """互动数可能缺失或为None，统一转为整数"""
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+_MONTHS = {name: index for index, name in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+
+def parse_created_at(value) -> int:
+    """
+    把发布时间解析为UTC时间戳（秒），无法解析时返回0
+    支持 'Wed Oct 10 20:19:24 +0000 2018'、ISO 8601 和 datetime，不带时区的按UTC处理
+    """
+    if not value:
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        if isinstance(value, datetime):
+            moment = value
+        elif value[:1].isdigit():
+            # ISO 8601（不能用 'T' in value 判断，Tue/Thu 也含T）
+            moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        else:
+            # 固定格式手工拆分，比strptime快一个数量级
+            _, month, day, clock, offset, year = value.split()
+            hour, minute, second = clock.split(':')
+            moment = datetime(int(year), _MONTHS[month], int(day), int(hour), int(minute), int(second),
+                              tzinfo=timezone.utc)
+            sign = -1 if offset[0] == '-' else 1
+            return int(moment.timestamp()) - sign * (int(offset[1:3]) * 3600 + int(offset[3:5]) * 60)
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return int(moment.timestamp())
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return 0
+
+def tweet_timestamp(tweet) -> int:
+    """推文的发布时间戳：Tweet记录直接读取解析好的值，字典则现场解析"""
+    created_ts = getattr(tweet, 'created_ts', None)
+    if created_ts is not None:
+        return created_ts
+    return parse_created_at(tweet.get('createdAt'))
+
+class Tweet:
+    """
+    两个数据源统一映射后的紧凑推文记录
+    使用__slots__节省内存，同时保留 tweet.get('likeCount') 等字典式访问以兼容旧代码
+    """
+    
+    __slots__ = ('id', 'text', 'created_at', 'created_ts', 'author_name', 'author_username', 'author_id',
+                 'like_count', 'retweet_count', 'reply_count', 'source')
+    
+    # 字典视图的键 -> 属性名（'author' 单独组装）
+    _FIELDS = {
+        'id': 'id',
+        'text': 'text',
+        'createdAt': 'created_at',
+        'likeCount': 'like_count',
+        'retweetCount': 'retweet_count',
+        'replyCount': 'reply_count',
+        'source': 'source',
+    }
+    
+    def __init__(self, id: str, text: str = '', created_at: str = '', author_name: str = '',
+                 author_username: str = '', author_id: str = '', like_count: int = 0,
+                 retweet_count: int = 0, reply_count: int = 0, source: str = 'twitterapi'):
+        self.id = str(id) if id is not None else ''
+        self.text = text or ''
+        self.created_at = created_at or ''
+        # 构造时解析一次，按时间过滤时直接比较整数
+        self.created_ts = parse_created_at(self.created_at)
+        self.author_name = author_name or ''
+        self.author_username = author_username or ''
+        self.author_id = str(author_id) if author_id is not None else ''
+        self.like_count = like_count
+        self.retweet_count = retweet_count
+        self.reply_count = reply_count
+        self.source = source
+    
+    @classmethod
+    def from_twitterapi(cls, data: Dict) -> 'Tweet':
+        """从TwitterAPI.io返回的推文JSON构造"""
+        author = data.get('author') or {}
+        return cls(
+            id=data.get('id'),
+            text=data.get('text'),
+            created_at=data.get('createdAt'),
+            author_name=author.get('name'),
+            author_username=author.get('userName'),
+            author_id=author.get('id'),
+            like_count=_count(data.get('likeCount')),
+            retweet_count=_count(data.get('retweetCount')),
+            reply_count=_count(data.get('replyCount')),
+            source='twitterapi',
+        )
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Tweet':
+        """从字典视图（to_dict的输出）还原"""
+        tweet = cls.from_twitterapi(data)
+        tweet.source = data.get('source') or tweet.source
+        return tweet
+    
+    @classmethod
+    def from_twikit(cls, tweet) -> 'Tweet':
+        """从twikit的Tweet对象构造"""
+        return cls(
+            id=tweet.id,
+            text=tweet.text,
+            created_at=tweet.created_at,
+            author_name=tweet.user.name,
+            author_username=tweet.user.screen_name,
+            author_id=tweet.user.id,
+            like_count=_count(getattr(tweet, 'favorite_count', 0)),
+            retweet_count=_count(getattr(tweet, 'retweet_count', 0)),
+            reply_count=_count(getattr(tweet, 'reply_count', 0)),
+            source='twikit',
+        )
+    
+    @property
+    def author(self) -> Dict:
+        return {'name': self.author_name, 'userName': self.author_username, 'id': self.author_id}
+    
+    def __getitem__(self, key: str):
+        if key == 'author':
+            return self.author
+        try:
+            return getattr(self, self._FIELDS[key])
+        except KeyError:
+            raise KeyError(key) from None
+    
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def __contains__(self, key) -> bool:
+        return key == 'author' or key in self._FIELDS
+    
+    def keys(self) -> List[str]:
+        return list(self._FIELDS) + ['author']
+    
+    def __iter__(self):
+        return iter(self.keys())
+    
+    def to_dict(self) -> Dict:
+        """转换为旧的字典格式"""
+        return {key: self[key] for key in self.keys()}
+    
+    def __repr__(self) -> str:
+        return f"Tweet(id={self.id!r}, author=@{self.author_username}, text={self.text[:40]!r})"
+
+def as_tweet(tweet) -> Tweet:
+    """旧的字典格式推文转换为Tweet记录，Tweet原样返回"""
+    return tweet if isinstance(tweet, Tweet) else Tweet.from_dict(tweet)
+
+def parse_tweets(data: Dict) -> List[Tweet]:
+    """把TwitterAPI.io响应中的推文数组映射为Tweet记录"""
+    return [Tweet.from_twitterapi(item) for item in data.get('tweets') or []]
+
+class BackendUnavailable(Exception):
+    """所有数据源都请求失败（区别于正常返回的空结果，如没有比since_id更新的推文）"""
+
+class CassetteMiss(Exception):
+    """回放模式下录像中没有对应的请求"""
+
+class ReplayedError(Exception):
+    """回放录制时发生的请求异常，保留状态码供熔断和限流判断"""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None, type_name: str = ''):
+        super().__init__(message)
+        self.status_code = status_code
+        self.type_name = type_name
+        self.response = SimpleNamespace(status_code=status_code) if status_code else None
+
+class Cassette:
+    """
+    数据源响应录像：record 模式把每次响应和耗时追加到gzip压缩的JSON Lines文件
+    replay 模式按请求键依次返回录制的响应，并按 原始耗时 × speed 等待
+    """
+    
+    def __init__(self, path: str, mode: str, speed: float = 1.0):
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.entries = {}
+        self.last = {}
+        self.stats = {'recorded': 0, 'replayed': 0, 'missed': 0}
+        self._lock = threading.Lock()
+        self._file = None
+        if mode == 'replay':
+            self._load()
+        elif mode == 'record':
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = gzip.open(path, 'wt', encoding='utf-8')
+            atexit.register(self.close)
+    
+    @property
+    def replaying(self) -> bool:
+        return self.mode == 'replay'
+    
+    def has(self, kind: str) -> bool:
+        """录像中是否有该数据源的响应"""
+        return any(key.startswith(f'["{kind}"') for key in self.entries)
+    
+    @staticmethod
+    def key(kind: str, name: str, args) -> str:
+        return json.dumps([kind, name, args], ensure_ascii=False, sort_keys=True, default=str)
+    
+    def _load(self):
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.entries.setdefault(entry['key'], deque()).append(entry)
+        except OSError as e:
+            print(f"⚠️  录像文件读取失败: {e}")
+            return
+        print(f"📼 已加载录像 {self.path}（{sum(len(v) for v in self.entries.values())} 条响应）")
+    
+    def _write(self, entry: Dict):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+            self.stats['recorded'] += 1
+    
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                print(f"📼 已保存录像 {self.path}（{self.stats['recorded']} 条响应）")
+    
+    def _next(self, key: str) -> Dict:
+        """按录制顺序取出响应，同一请求回放次数多于录制次数时重复最后一条"""
+        with self._lock:
+            queue = self.entries.get(key)
+            if queue:
+                self.last[key] = queue.popleft()
+            entry = self.last.get(key)
+            self.stats['replayed' if entry else 'missed'] += 1
+        if entry is None:
+            raise CassetteMiss(f"录像中没有该请求: {key}")
+        return entry
+    
+    @staticmethod
+    def _encode(value, tweets: bool):
+        return [tweet.to_dict() for tweet in value] if tweets else value
+    
+    @staticmethod
+    def _decode(value, tweets: bool):
+        return [Tweet.from_dict(item) for item in value] if tweets else value
+    
+    @staticmethod
+    def _error(error: Exception) -> Dict:
+        status_code = getattr(error, 'status_code', None)
+        if status_code is None:
+            status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+        return {'type': type(error).__name__, 'message': str(error), 'status': status_code}
+    
+    @staticmethod
+    def _raise(error: Dict):
+        raise ReplayedError(error['message'], error.get('status'), error.get('type', ''))
+    
+    def _replay_value(self, entry: Dict, tweets: bool):
+        if 'error' in entry:
+            self._raise(entry['error'])
+        return self._decode(entry['data'], tweets)
+    
+    async def call(self, kind: str, name: str, args, request, tweets: bool = False):
+        """录制或回放一次异步请求"""
+        key = self.key(kind, name, args)
+        if self.replaying:
+            entry = self._next(key)
+            if self.speed > 0:
+                await asyncio.sleep(entry['elapsed'] * self.speed)
+            return self._replay_value(entry, tweets)
+        
+        start = time.perf_counter()
+        try:
+            value = await request()
+        except Exception as e:
+            self._write({'key': key, 'elapsed': round(time.perf_counter() - start, 4), 'error': self._error(e)})
+            raise
+        self._write({'key': key, 'elapsed': round(time.perf_counter() - start, 4),
+                     'data': self._encode(value, tweets)})
+        return value
+    
+    def call_sync(self, kind: str, name: str, args, request, tweets: bool = False):
+        """录制或回放一次同步请求"""
+        key = self.key(kind, name, args)
+        if self.replaying:
+            entry = self._next(key)
+            if self.speed > 0:
+                time.sleep(entry['elapsed'] * self.speed)
+            return self._replay_value(entry, tweets)
+        
+        start = time.perf_counter()
+        try:
+            value = request()
+        except Exception as e:
+            self._write({'key': key, 'elapsed': round(time.perf_counter() - start, 4), 'error': self._error(e)})
+            raise
+        self._write({'key': key, 'elapsed': round(time.perf_counter() - start, 4),
+                     'data': self._encode(value, tweets)})
+        return value
+    
+    async def iter_pages(self, kind: str, name: str, args, pages) -> AsyncIterator[List[Tweet]]:
+        """录制或回放逐页获取，每页单独记录耗时"""
+        key = self.key(kind, name, args)
+        if self.replaying:
+            entry = self._next(key)
+            for page, elapsed in zip(entry['pages'], entry['elapsed']):
+                if self.speed > 0:
+                    await asyncio.sleep(elapsed * self.speed)
+                yield self._decode(page, True)
+            if entry.get('error'):
+                self._raise(entry['error'])
+            return
+        
+        recorded, timings, error = [], [], None
+        start = time.perf_counter()
+        try:
+            async for page in pages():
+                recorded.append(self._encode(page, True))
+                timings.append(round(time.perf_counter() - start, 4))
+                yield page
+                start = time.perf_counter()
+        except Exception as e:
+            error = self._error(e)
+            raise
+        finally:
+            # 调用方提前停止时也保存已获取的页
+            self._write({'key': key, 'pages': recorded, 'elapsed': timings, 'error': error})
+
+_cassette = None
+
+def shared_cassette() -> Optional[Cassette]:
+    """按 TWITTER_CASSETTE_MODE 创建进程共享的录像，未启用时返回None"""
+    global _cassette
+    if _cassette is None and CASSETTE_MODE in ('record', 'replay'):
+        _cassette = Cassette(CASSETTE_FILE, CASSETTE_MODE, CASSETTE_SPEED)
+    return _cassette
 
 class TwitterAPIClient:
     """TwitterAPI.io客户端（主要方案）"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, limiter: RateLimiter = None, cache: 'ResponseCache' = None,
+                 cassette: Cassette = None):
         self.api_key = api_key
+        self.rate_limiter = limiter or rate_limiter
+        self.cassette = cassette or shared_cassette()
+        
+        # 磁盘响应缓存（可选），重跑工作流时避免重复付费请求
+        if cache is None and HTTP_CACHE_ENABLED:
+            cache = ResponseCache(HTTP_CACHE_DIR)
+        self.cache = cache
         self.headers = {
             'X-API-Key': api_key,
             'User-Agent': 'TwitterContentBot/1.0'
         }
-        self.base_url = "https://api.twitterapi.io/twitter"
+        self.base_url = API_BASE_URL.rstrip('/')
+        
+        # 同步请求复用同一个Session（连接池 + keep-alive），首次使用时才导入requests
+        self._session = None
+        
+        # 异步连接池按事件循环惰性创建
+        self._async_session = None
+        self._async_session_loop = None
     
-    def get_user_tweets(self, username: str, max_results: int = 10) -> List[Dict]:
-        """获取用户推文"""
-        url = f"{self.base_url}/user/tweets"
+    @property
+    def session(self):
+        """同步请求使用的requests.Session"""
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+            self._session.headers.update(self.headers)
+        return self._session
+    
+    def _user_tweets_params(self, username: str, max_results: int, since_id: str = None) -> Dict:
+        """构造用户推文请求参数"""
         params = {
             'username': username.replace('@', ''),
             'max_results': max_results,
             'exclude': 'retweets,replies'
         }
+        if since_id:
+            params['since_id'] = since_id
+        return params
+    
+    def _search_params(self, query: str, max_results: int, since_id: str = None) -> Dict:
+        """构造搜索请求参数"""
+        return {
+            'query': with_since_id(query, since_id),
+            'max_results': max_results,
+            'sort_order': 'relevancy'
+        }
+    
+    def _cache_lookup(self, path: str, params: Dict) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        查询响应缓存，返回 (缓存条目, 条件请求头)
+        条件请求头为None表示缓存仍然新鲜，可直接使用
+        """
+        if self.cache is None:
+            return None, {}
+        entry = self.cache.get(path, params)
+        if entry is None:
+            return None, {}
+        # 录制时不直接使用新鲜缓存，改发条件请求，录下的是真实的网络耗时
+        recording = self.cassette is not None and self.cassette.mode == 'record'
+        if self.cache.is_fresh(path, entry) and not recording:
+            print(f"   💾 [TwitterAPI] 命中缓存 {path}")
+            return entry, None
+        return entry, self.cache.validators(entry)
+    
+    def _handle_response(self, path: str, params: Dict, response, entry: Optional[Dict]) -> Dict:
+        """处理响应：304使用缓存，200写入缓存"""
+        if response.status_code == 304 and entry is not None:
+            print(f"   💾 [TwitterAPI] 缓存未变化(304) {path}")
+            self.cache.refresh(path, params, entry, response.headers)
+            return entry['data']
+        
+        response.raise_for_status()
+        data = decode_response(response.content)
+        if self.cache is not None:
+            self.cache.put(path, params, data, response.headers)
+        return data
+    
+    def _request(self, path: str, params: Dict, headers: Dict = None):
+        """同步GET请求，遇到429按服务端要求等待后重试"""
+        key = f"twitterapi:{path}"
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            self.rate_limiter.acquire_sync(key)
+            response = self.session.get(f"{self.base_url}{path}", params=params,
+                                        headers=headers, timeout=HTTP_TIMEOUT)
+            delay = self.rate_limiter.update_from_headers(key, response.headers, response.status_code)
+            if response.status_code == 429 and attempt < RATE_LIMIT_RETRIES and delay <= RATE_LIMIT_MAX_WAIT:
+                print(f"⏳ [TwitterAPI] 触发限流，{delay:.1f}s 后重试...")
+                continue
+            return response
+    
+    def _get_json(self, path: str, params: Dict) -> Dict:
+        """同步GET请求并解析JSON（启用录像时录制或回放）"""
+        if self.cassette is not None:
+            return self.cassette.call_sync('twitterapi', path, params, lambda: self._load_json(path, params))
+        return self._load_json(path, params)
+    
+    def _load_json(self, path: str, params: Dict) -> Dict:
+        """同步GET请求并解析JSON"""
+        entry, headers = self._cache_lookup(path, params)
+        if headers is None:
+            return entry['data']
+        response = self._request(path, params, headers)
+        return self._handle_response(path, params, response, entry)
+    
+    def _get_async_session(self):
+        """获取当前事件循环上的共享异步连接池"""
+        loop = asyncio.get_running_loop()
+        if self._async_session is None or self._async_session_loop is not loop:
+            # 旧连接池绑定在已关闭的事件循环上，不能复用
+            use_http2 = HTTP2_ENABLED and _http2_available()
+            if HTTP2_ENABLED and not use_http2:
+                print("⚠️  未安装h2，HTTP/2已禁用: pip install 'httpx[http2]'")
+            httpx = _load_optional('httpx')
+            self._async_session = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=HTTP_TIMEOUT,
+                http2=use_http2,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE
+                )
+            )
+            self._async_session_loop = loop
+        return self._async_session
+    
+    async def _request_async(self, path: str, params: Dict, headers: Dict = None):
+        """异步GET请求，遇到429按服务端要求等待后重试"""
+        key = f"twitterapi:{path}"
+        session = self._get_async_session()
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            # 排队等待令牌，而不是直接打满后收到429
+            await self.rate_limiter.acquire(key)
+            response = await session.get(f"{self.base_url}{path}", params=params, headers=headers)
+            delay = self.rate_limiter.update_from_headers(key, response.headers, response.status_code)
+            if response.status_code == 429 and attempt < RATE_LIMIT_RETRIES and delay <= RATE_LIMIT_MAX_WAIT:
+                print(f"⏳ [TwitterAPI] 触发限流，{delay:.1f}s 后重试...")
+                continue
+            return response
+    
+    async def _get_json_async(self, path: str, params: Dict) -> Dict:
+        """异步GET请求并解析JSON（启用录像时录制或回放）"""
+        if self.cassette is not None:
+            return await self.cassette.call('twitterapi', path, params,
+                                            lambda: self._load_json_async(path, params))
+        return await self._load_json_async(path, params)
+    
+    async def _load_json_async(self, path: str, params: Dict) -> Dict:
+        """异步GET请求并解析JSON，不阻塞事件循环"""
+        if _load_optional('httpx') is None:
+            # 没有httpx时放到线程池执行，避免阻塞事件循环
+            return await asyncio.to_thread(self._load_json, path, params)
         
+        entry, headers = self._cache_lookup(path, params)
+        if headers is None:
+            return entry['data']
+        response = await self._request_async(path, params, headers)
+        return self._handle_response(path, params, response, entry)
+    
+    async def aclose(self):
+        """关闭异步连接池"""
+        if self._async_session is not None:
+            try:
+                await self._async_session.aclose()
+            except RuntimeError:
+                # 连接池所属的事件循环已关闭
+                pass
+            self._async_session = None
+            self._async_session_loop = None
+    
+    def get_user_tweets(self, username: str, max_results: int = 10) -> List[Dict]:
+        """获取用户推文"""
         try:
             print(f"🔍 [TwitterAPI] 获取 @{username} 的推文...")
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json('/user/tweets', self._user_tweets_params(username, max_results))
             
-            tweets = data.get('tweets', [])
+            tweets = parse_tweets(data)
             print(f"   ✅ 找到 {len(tweets)} 条推文")
             return tweets
             
@@ -51,48 +958,280 @@ class TwitterAPIClient:
     
     def search_tweets(self, query: str, max_results: int = 20) -> List[Dict]:
         """搜索推文"""
-        url = f"{self.base_url}/tweet/advanced_search"
-        params = {
-            'query': query,
-            'max_results': max_results,
-            'sort_order': 'relevancy'
-        }
-        
         try:
             print(f"🔍 [TwitterAPI] 搜索: {query}")
-            response = requests.get(url, headers=self.headers, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json('/tweet/advanced_search', self._search_params(query, max_results))
             
-            tweets = data.get('tweets', [])
+            tweets = parse_tweets(data)
             print(f"   ✅ 找到 {len(tweets)} 条推文")
             return tweets
             
         except Exception as e:
             print(f"   ❌ TwitterAPI搜索失败: {e}")
             return []
+    
+    async def _fetch_user_tweets_async(self, username: str, max_results: int = 10,
+                                       since_id: str = None) -> List[Dict]:
+        """异步获取用户推文，失败时抛出异常"""
+        print(f"🔍 [TwitterAPI] 获取 @{username} 的推文...")
+        params = self._user_tweets_params(username, max_results, since_id)
+        data = await self._get_json_async('/user/tweets', params)
+        
+        tweets = parse_tweets(data)
+        print(f"   ✅ 找到 {len(tweets)} 条推文")
+        return tweets
+    
+    async def _fetch_search_tweets_async(self, query: str, max_results: int = 20,
+                                         since_id: str = None) -> List[Dict]:
+        """异步搜索推文，失败时抛出异常"""
+        print(f"🔍 [TwitterAPI] 搜索: {query}")
+        params = self._search_params(query, max_results, since_id)
+        data = await self._get_json_async('/tweet/advanced_search', params)
+        
+        tweets = parse_tweets(data)
+        print(f"   ✅ 找到 {len(tweets)} 条推文")
+        return tweets
+    
+    async def _fetch_page_async(self, path: str, params: Dict,
+                                cursor: Optional[str]) -> Tuple[List[Dict], Optional[str]]:
+        """获取一页数据，返回 (推文列表, 下一页游标)"""
+        if cursor:
+            params = dict(params, cursor=cursor)
+        data = await self._get_json_async(path, params)
+        
+        next_cursor = data.get('next_cursor') or None
+        if not data.get('has_next_page', bool(next_cursor)) or next_cursor == cursor:
+            next_cursor = None
+        return parse_tweets(data), next_cursor
+    
+    async def _iter_pages(self, path: str, params: Dict) -> AsyncIterator[List[Dict]]:
+        """沿游标逐页获取，直到没有下一页"""
+        cursor = None
+        while True:
+            tweets, cursor = await self._fetch_page_async(path, params, cursor)
+            if tweets:
+                yield tweets
+            if not tweets or not cursor:
+                return
+    
+    def iter_user_tweet_pages(self, username: str, page_size: int = 20) -> AsyncIterator[List[Dict]]:
+        """逐页获取用户推文，失败时抛出异常"""
+        print(f"🔍 [TwitterAPI] 分页获取 @{username} 的推文...")
+        return self._iter_pages('/user/tweets', self._user_tweets_params(username, page_size))
+    
+    def iter_search_pages(self, query: str, page_size: int = 20) -> AsyncIterator[List[Dict]]:
+        """逐页获取搜索结果，失败时抛出异常"""
+        print(f"🔍 [TwitterAPI] 分页搜索: {query}")
+        return self._iter_pages('/tweet/advanced_search', self._search_params(query, page_size))
+    
+    async def get_user_tweets_async(self, username: str, max_results: int = 10) -> List[Dict]:
+        """异步获取用户推文"""
+        try:
+            return await self._fetch_user_tweets_async(username, max_results)
+        except Exception as e:
+            print(f"   ❌ TwitterAPI失败: {e}")
+            return []
+    
+    async def search_tweets_async(self, query: str, max_results: int = 20) -> List[Dict]:
+        """异步搜索推文"""
+        try:
+            return await self._fetch_search_tweets_async(query, max_results)
+        except Exception as e:
+            print(f"   ❌ TwitterAPI搜索失败: {e}")
+            return []
+
+class UserIdCache:
+    """
+    用户名 → 用户id/资料的本地缓存，持久化到JSON文件
+    不存在的账号也会缓存（负缓存），避免每次运行重复查询
+    """
+    
+    def __init__(self, path: str, ttl: float = USER_CACHE_TTL, negative_ttl: float = USER_CACHE_NEGATIVE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries = {}
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  用户id缓存加载失败: {e}")
+    
+    def get(self, screen_name: str) -> Optional[Dict]:
+        """返回未过期的缓存条目，未命中返回None"""
+        entry = self.entries.get(screen_name.lower())
+        if entry is None:
+            return None
+        ttl = self.negative_ttl if entry.get('missing') else self.ttl
+        if time.time() - entry.get('cached_at', 0) > ttl:
+            return None
+        return entry
+    
+    def put(self, screen_name: str, user):
+        self.entries[screen_name.lower()] = {
+            'id': str(user.id),
+            'name': getattr(user, 'name', ''),
+            'screen_name': getattr(user, 'screen_name', screen_name),
+            'cached_at': time.time()
+        }
+        self._dirty = True
+    
+    def put_missing(self, screen_name: str):
+        self.entries[screen_name.lower()] = {'missing': True, 'cached_at': time.time()}
+        self._dirty = True
+    
+    def save(self):
+        if not self._dirty:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            print(f"⚠️  用户id缓存保存失败: {e}")
+
+_user_id_cache = None
+
+async def warm_user_id_cache(cache: UserIdCache, usernames: List[str], resolve,
+                             concurrency: int = 5) -> Dict[str, Optional[str]]:
+    """并发解析缓存中缺失的用户名，返回 用户名 → 用户id（不存在为None）"""
+    names = [name.replace('@', '').strip() for name in usernames if name and name.strip()]
+    missing = [name for name in names if cache.get(name) is None]
+    if missing:
+        print(f"🔥 [Twikit] 预解析 {len(missing)}/{len(names)} 个账号的用户id...")
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def resolve_one(name: str):
+            async with semaphore:
+                try:
+                    await resolve(name)
+                except Exception as e:
+                    print(f"   ⚠️  @{name} 解析失败: {e}")
+        
+        await asyncio.gather(*(resolve_one(name) for name in missing))
+        cache.save()
+    
+    resolved = {}
+    for name in names:
+        cached = cache.get(name)
+        resolved[name] = cached.get('id') if cached and not cached.get('missing') else None
+    return resolved
+
+def shared_user_id_cache() -> UserIdCache:
+    """所有TwikitClient共享同一个用户id缓存"""
+    global _user_id_cache
+    if _user_id_cache is None:
+        _user_id_cache = UserIdCache(USER_CACHE_FILE)
+    return _user_id_cache
 
 class TwikitClient:
     """Twikit客户端（兜底方案）"""
     
-    def __init__(self, username: str = None, password: str = None, email: str = None):
+    def __init__(self, username: str = None, password: str = None, email: str = None,
+                 limiter: RateLimiter = None, session_file: str = None, user_cache: 'UserIdCache' = None,
+                 cassette: Cassette = None):
         self.client = None
+        self.rate_limiter = limiter or rate_limiter
+        self.user_cache = user_cache or shared_user_id_cache()
+        self.cassette = cassette or shared_cassette()
+        self.rate_limit_retries = RATE_LIMIT_RETRIES
         self.username = username
         self.password = password
         self.email = email
         self.authenticated = False
         
-        # 尝试导入twikit
+        # 登录会话（cookies）持久化文件，每个账号一个
+        self.session_file = session_file or twikit_session_file(username)
+        
+        # twikit在首次使用时才导入，TwitterAPI.io正常时不付出导入开销
+        self._client_class = None
+    
+    @property
+    def Client(self):
+        """twikit.Client类，未安装时为None"""
+        if self._client_class is None:
+            try:
+                from twikit import Client
+                self._client_class = Client
+                print("✅ Twikit库已加载")
+            except ImportError:
+                print("❌ Twikit库未安装，请运行: pip install twikit")
+                self._client_class = False
+        return self._client_class or None
+    
+    def _read_session(self) -> Optional[Dict]:
+        """读取保存的会话"""
+        if not self.session_file or not os.path.exists(self.session_file):
+            return None
         try:
-            from twikit import Client
-            self.Client = Client
-            print("✅ Twikit库已加载")
-        except ImportError:
-            print("❌ Twikit库未安装，请运行: pip install twikit")
-            self.Client = None
+            with open(self.session_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
     
-    async def authenticate(self) -> bool:
-        """认证登录"""
+    def _save_session(self, saved_at: float = None):
+        """保存当前cookies（仅所有者可读）"""
+        if not self.session_file:
+            return
+        try:
+            directory = os.path.dirname(self.session_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            now = time.time()
+            session = {
+                'username': self.username,
+                'cookies': self.client.get_cookies(),
+                'saved_at': saved_at or now,
+                'validated_at': now
+            }
+            fd = os.open(self.session_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(session, f)
+        except Exception as e:
+            print(f"⚠️  [Twikit] 会话保存失败: {e}")
+    
+    def invalidate_session(self):
+        """会话失效：删除保存的cookies，下次认证时重新登录"""
+        self.authenticated = False
+        if self.session_file and os.path.exists(self.session_file):
+            os.remove(self.session_file)
+    
+    async def _restore_session(self) -> bool:
+        """
+        恢复保存的会话；最近验证过的直接信任，
+        否则用一次轻量请求（user_id）验证cookies是否仍然有效
+        """
+        session = self._read_session()
+        if not session or not session.get('cookies'):
+            return False
+        
+        try:
+            self.client.set_cookies(session['cookies'])
+            if time.time() - session.get('validated_at', 0) > TWIKIT_SESSION_TRUST:
+                await self.client.user_id()
+                self._save_session(saved_at=session.get('saved_at'))
+        except Exception as e:
+            print(f"⚠️  [Twikit] 保存的会话已失效: {e}")
+            self.client = self.Client('en-US')
+            return False
+        
+        self.authenticated = True
+        print("✅ [Twikit] 已复用保存的登录会话")
+        return True
+    
+    async def authenticate(self, force_login: bool = False) -> bool:
+        """认证登录：优先复用保存的会话，失效时才重新登录"""
+        if self.cassette is not None and self.cassette.replaying:
+            # 回放不访问网络，无需登录
+            self.authenticated = True
+            return True
         if not self.Client:
             return False
             
@@ -100,6 +1239,9 @@ class TwikitClient:
             self.client = self.Client('en-US')
             
             if self.username and self.password:
+                if not force_login and await self._restore_session():
+                    return True
+                
                 print("🔐 [Twikit] 尝试登录...")
                 await self.client.login(
                     auth_info_1=self.username,
@@ -107,6 +1249,7 @@ class TwikitClient:
                     password=self.password
                 )
                 self.authenticated = True
+                self._save_session()
                 print("✅ [Twikit] 登录成功")
                 return True
             else:
@@ -119,85 +1262,740 @@ class TwikitClient:
             print(f"❌ [Twikit] 认证失败: {e}")
             return False
     
-    async def get_user_tweets(self, username: str, max_results: int = 10) -> List[Dict]:
-        """获取用户推文"""
+    async def _limited(self, endpoint: str, request):
+        """按端点限流执行请求，遇到限流异常时等待后重试，会话过期时重新登录一次"""
+        key = f"twikit:{endpoint}"
+        attempt = 0
+        relogged = False
+        while True:
+            await self.rate_limiter.acquire(key)
+            try:
+                return await request()
+            except Exception as e:
+                if _is_auth_error(e) and self.username and not relogged:
+                    print("🔐 [Twikit] 登录会话已过期，重新登录...")
+                    relogged = True
+                    self.invalidate_session()
+                    if await self.authenticate(force_login=True):
+                        continue
+                    raise
+                delay = self.rate_limiter.update_from_error(key, e)
+                if delay is None or attempt >= self.rate_limit_retries or delay > RATE_LIMIT_MAX_WAIT:
+                    raise
+                attempt += 1
+                print(f"⏳ [Twikit] 触发限流，{delay:.1f}s 后重试...")
+    
+    def _format_tweets(self, tweets) -> List[Tweet]:
+        """转换为标准格式"""
+        return [Tweet.from_twikit(tweet) for tweet in tweets]
+    
+    async def _resolve_user_id(self, username: str, save: bool = True) -> Optional[str]:
+        """用户名转用户id：优先查本地缓存（含不存在账号的负缓存），未命中再请求"""
+        screen_name = username.replace('@', '').strip()
+        cached = self.user_cache.get(screen_name)
+        if cached is not None:
+            if cached.get('missing'):
+                print(f"   ❌ 用户 @{screen_name} 不存在（缓存）")
+                return None
+            return cached['id']
+        
+        try:
+            user = await self._limited(
+                'user_lookup', lambda: self.client.get_user_by_screen_name(screen_name)
+            )
+        except Exception as e:
+            if type(e).__name__ != 'UserNotFound':
+                raise
+            user = None
+        
+        if not user:
+            print(f"   ❌ 用户 @{screen_name} 不存在")
+            self.user_cache.put_missing(screen_name)
+        else:
+            self.user_cache.put(screen_name, user)
+        if save:
+            self.user_cache.save()
+        return user.id if user else None
+    
+    async def warm_user_cache(self, usernames: List[str], concurrency: int = 5) -> Dict[str, Optional[str]]:
+        """批量预解析用户名，只请求缓存中缺失或过期的账号，最后统一保存一次"""
+        if not self.client:
+            return {}
+        return await warm_user_id_cache(
+            self.user_cache, usernames, lambda name: self._resolve_user_id(name, save=False), concurrency
+        )
+    
+    async def _iter_result_pages(self, endpoint: str, result) -> AsyncIterator[List[Dict]]:
+        """沿twikit Result的游标逐页获取"""
+        while result is not None:
+            page = self._format_tweets(result)
+            if not page:
+                return
+            yield page
+            if not getattr(result, 'next_cursor', None):
+                return
+            result = await self._limited(endpoint, result.next)
+    
+    def iter_user_tweet_pages(self, username: str, page_size: int = 20) -> AsyncIterator[List[Dict]]:
+        """逐页获取用户推文，失败时抛出异常（启用录像时录制或回放）"""
+        if self.cassette is not None:
+            return self.cassette.iter_pages('twikit', 'user_pages', [username, page_size],
+                                            lambda: self._request_user_tweet_pages(username, page_size))
+        return self._request_user_tweet_pages(username, page_size)
+    
+    def iter_search_pages(self, query: str, page_size: int = 20) -> AsyncIterator[List[Dict]]:
+        """逐页获取搜索结果，失败时抛出异常（启用录像时录制或回放）"""
+        if self.cassette is not None:
+            return self.cassette.iter_pages('twikit', 'search_pages', [query, page_size],
+                                            lambda: self._request_search_pages(query, page_size))
+        return self._request_search_pages(query, page_size)
+    
+    async def _request_user_tweet_pages(self, username: str, page_size: int) -> AsyncIterator[List[Dict]]:
+        if not self.client:
+            # 未安装或未登录，按失败处理，不能当作没有推文
+            raise BackendUnavailable("Twikit客户端不可用")
+        
+        print(f"🔍 [Twikit] 分页获取 @{username} 的推文...")
+        user_id = await self._resolve_user_id(username)
+        if not user_id:
+            return
+        
+        result = await self._limited(
+            'user_tweets', lambda: self.client.get_user_tweets(user_id, 'Tweets', count=page_size)
+        )
+        async for page in self._iter_result_pages('user_tweets', result):
+            yield page
+    
+    async def _request_search_pages(self, query: str, page_size: int) -> AsyncIterator[List[Dict]]:
+        if not self.client:
+            # 未安装或未登录，按失败处理，不能当作没有推文
+            raise BackendUnavailable("Twikit客户端不可用")
+        
+        print(f"🔍 [Twikit] 分页搜索: {query}")
+        result = await self._limited(
+            'search', lambda: self.client.search_tweet(query, 'Latest', count=page_size)
+        )
+        async for page in self._iter_result_pages('search', result):
+            yield page
+    
+    async def _fetch_user_tweets(self, username: str, max_results: int = 10,
+                                 since_id: str = None) -> List[Dict]:
+        """获取用户推文，请求失败时抛出异常（时间线不支持since_id，由调用方过滤）"""
+        if self.cassette is not None:
+            return await self.cassette.call('twikit', 'user_tweets', [username, max_results],
+                                            lambda: self._request_user_tweets(username, max_results),
+                                            tweets=True)
+        return await self._request_user_tweets(username, max_results)
+    
+    async def _request_user_tweets(self, username: str, max_results: int) -> List[Dict]:
         if not self.client:
+            # 未安装或未登录，按失败处理，不能当作没有推文
+            raise BackendUnavailable("Twikit客户端不可用")
+        
+        print(f"🔍 [Twikit] 获取 @{username} 的推文...")
+        
+        # 获取用户id（优先使用本地缓存）
+        user_id = await self._resolve_user_id(username)
+        if not user_id:
             return []
         
+        # 获取用户推文
+        tweets = await self._limited(
+            'user_tweets', lambda: self.client.get_user_tweets(user_id, 'Tweets', count=max_results)
+        )
+        formatted_tweets = self._format_tweets(tweets)
+        
+        print(f"   ✅ 找到 {len(formatted_tweets)} 条推文")
+        return formatted_tweets
+    
+    async def _fetch_search_tweets(self, query: str, max_results: int = 20,
+                                   since_id: str = None) -> List[Dict]:
+        """搜索推文，请求失败时抛出异常"""
+        if self.cassette is not None:
+            return await self.cassette.call('twikit', 'search', [query, max_results, since_id],
+                                            lambda: self._request_search_tweets(query, max_results, since_id),
+                                            tweets=True)
+        return await self._request_search_tweets(query, max_results, since_id)
+    
+    async def _request_search_tweets(self, query: str, max_results: int, since_id: str = None) -> List[Dict]:
+        if not self.client:
+            # 未安装或未登录，按失败处理，不能当作没有推文
+            raise BackendUnavailable("Twikit客户端不可用")
+        
+        print(f"🔍 [Twikit] 搜索: {query}")
+        
+        # 搜索推文
+        tweets = await self._limited(
+            'search', lambda: self.client.search_tweet(with_since_id(query, since_id), 'Latest', count=max_results)
+        )
+        formatted_tweets = self._format_tweets(tweets)
+        
+        print(f"   ✅ 找到 {len(formatted_tweets)} 条推文")
+        return formatted_tweets
+    
+    async def get_user_tweets(self, username: str, max_results: int = 10) -> List[Dict]:
+        """获取用户推文"""
         try:
-            print(f"🔍 [Twikit] 获取 @{username} 的推文...")
-            
-            # 获取用户信息
-            user = await self.client.get_user_by_screen_name(username.replace('@', ''))
-            if not user:
-                print(f"   ❌ 用户 @{username} 不存在")
-                return []
-            
-            # 获取用户推文
-            tweets = await self.client.get_user_tweets(user.id, 'Tweets', count=max_results)
-            
-            # 转换为标准格式
-            formatted_tweets = []
-            for tweet in tweets:
-                formatted_tweet = {
-                    'id': tweet.id,
-                    'text': tweet.text,
-                    'createdAt': tweet.created_at,
-                    'author': {
-                        'name': tweet.user.name,
-                        'userName': tweet.user.screen_name,
-                        'id': tweet.user.id
-                    },
-                    'likeCount': getattr(tweet, 'favorite_count', 0),
-                    'retweetCount': getattr(tweet, 'retweet_count', 0),
-                    'replyCount': getattr(tweet, 'reply_count', 0),
-                    'source': 'twikit'
-                }
-                formatted_tweets.append(formatted_tweet)
-            
-            print(f"   ✅ 找到 {len(formatted_tweets)} 条推文")
-            return formatted_tweets
-            
+            return await self._fetch_user_tweets(username, max_results)
         except Exception as e:
             print(f"   ❌ [Twikit] 获取推文失败: {e}")
             return []
     
     async def search_tweets(self, query: str, max_results: int = 20) -> List[Dict]:
         """搜索推文"""
-        if not self.client:
+        try:
+            return await self._fetch_search_tweets(query, max_results)
+        except Exception as e:
+            print(f"   ❌ [Twikit] 搜索失败: {e}")
             return []
+
+def load_twikit_credentials() -> List[Dict]:
+    """
+    读取Twikit账号凭据：TWITTER_USERNAME/PASSWORD/EMAIL，
+    以及带数字后缀的多组凭据（TWITTER_USERNAME_2、TWITTER_PASSWORD_2 ...）
+    """
+    suffixes = ['']
+    numbered = set()
+    for key in os.environ:
+        match = re.fullmatch(r'TWITTER_USERNAME_(\d+)', key)
+        if match:
+            numbered.add(int(match.group(1)))
+    suffixes += [f"_{n}" for n in sorted(numbered)]
+    
+    credentials = []
+    seen = set()
+    for suffix in suffixes:
+        username = os.environ.get(f'TWITTER_USERNAME{suffix}')
+        password = os.environ.get(f'TWITTER_PASSWORD{suffix}')
+        if not username or not password or username.lower() in seen:
+            continue
+        seen.add(username.lower())
+        credentials.append({
+            'username': username,
+            'password': password,
+            'email': os.environ.get(f'TWITTER_EMAIL{suffix}')
+        })
+    return credentials
+
+def _quarantine_seconds(error: Exception) -> Optional[float]:
+    """账号被限流或被风控挑战时返回隔离时长，其他错误返回None"""
+    name = type(error).__name__
+    if name == 'TooManyRequests':
+        reset = getattr(error, 'rate_limit_reset', None)
+        if reset:
+            return max(60.0, float(reset) - time.time())
+        return TWIKIT_RATE_LIMIT_QUARANTINE
+    if name in ('AccountLocked', 'AccountSuspended', 'Forbidden', 'Unauthorized'):
+        return TWIKIT_QUARANTINE
+    if 'challenge' in str(error).lower() or 'captcha' in str(error).lower():
+        return TWIKIT_QUARANTINE
+    return None
+
+class TwikitPool:
+    """
+    多账号Twikit会话池：每个账号独立的登录会话和限流状态，
+    请求分配给在途请求最少的健康会话，被限流或风控的会话自动隔离
+    """
+    
+    def __init__(self, credentials: List[Dict]):
+        self.members = []
+        for credential in credentials:
+            member = TwikitClient(
+                username=credential['username'],
+                password=credential['password'],
+                email=credential.get('email'),
+                # 每个账号单独计算配额
+                limiter=RateLimiter()
+            )
+            # 限流时直接换账号，不在单个账号上等待重试
+            member.rate_limit_retries = 0
+            self.members.append(member)
         
+        self.in_flight = {member.username: 0 for member in self.members}
+        self.last_used = {member.username: 0.0 for member in self.members}
+        self.quarantined_until = {}
+        self._relogging = set()
+        print(f"✅ Twikit账号池已初始化: {len(self.members)} 个账号")
+    
+    @property
+    def Client(self):
+        return self.members[0].Client if self.members else None
+    
+    @property
+    def authenticated(self) -> bool:
+        return any(member.authenticated for member in self.members)
+    
+    async def authenticate(self) -> bool:
+        """并发认证所有账号（已保存的会话会直接复用）"""
+        results = await asyncio.gather(*(member.authenticate() for member in self.members))
+        for member, ok in zip(self.members, results):
+            if not ok or not member.authenticated:
+                self.quarantine(member, TWIKIT_QUARANTINE, '认证失败')
+        return any(results)
+    
+    def quarantine(self, member: TwikitClient, seconds: float, reason: str):
+        self.quarantined_until[member.username] = time.time() + seconds
+        print(f"🚧 [Twikit池] 隔离账号 {member.username} {seconds:.0f}s: {reason}")
+    
+    async def _relogin_expired(self):
+        """隔离到期但仍未登录的账号重新认证，失败时再次隔离"""
+        now = time.time()
+        expired = [
+            member for member in self.members
+            if not member.authenticated and member.username not in self._relogging
+            and self.quarantined_until.get(member.username, 0) <= now
+        ]
+        if not expired:
+            return
+        self._relogging.update(member.username for member in expired)
         try:
-            print(f"🔍 [Twikit] 搜索: {query}")
-            
-            # 搜索推文
-            tweets = await self.client.search_tweet(query, 'Latest', count=max_results)
-            
-            # 转换为标准格式
-            formatted_tweets = []
-            for tweet in tweets:
-                formatted_tweet = {
-                    'id': tweet.id,
-                    'text': tweet.text,
-                    'createdAt': tweet.created_at,
-                    'author': {
-                        'name': tweet.user.name,
-                        'userName': tweet.user.screen_name,
-                        'id': tweet.user.id
-                    },
-                    'likeCount': getattr(tweet, 'favorite_count', 0),
-                    'retweetCount': getattr(tweet, 'retweet_count', 0),
-                    'replyCount': getattr(tweet, 'reply_count', 0),
-                    'source': 'twikit'
-                }
-                formatted_tweets.append(formatted_tweet)
-            
-            print(f"   ✅ 找到 {len(formatted_tweets)} 条推文")
-            return formatted_tweets
-            
+            results = await asyncio.gather(*(member.authenticate() for member in expired))
+        finally:
+            self._relogging.difference_update(member.username for member in expired)
+        for member, ok in zip(expired, results):
+            if not ok or not member.authenticated:
+                self.quarantine(member, TWIKIT_QUARANTINE, '认证失败')
+    
+    def healthy_members(self) -> List[TwikitClient]:
+        now = time.time()
+        return [
+            member for member in self.members
+            if member.authenticated and self.quarantined_until.get(member.username, 0) <= now
+        ]
+    
+    def _pick(self, exclude: set) -> Optional[TwikitClient]:
+        """选择在途请求最少的健康账号，相同时选最久未使用的"""
+        candidates = [member for member in self.healthy_members() if member.username not in exclude]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda m: (self.in_flight[m.username], self.last_used[m.username]))
+    
+    async def _run(self, call):
+        """在选中的账号上执行请求，账号不可用时换下一个"""
+        await self._relogin_expired()
+        tried = set()
+        last_error = None
+        while True:
+            member = self._pick(tried)
+            if member is None:
+                if last_error:
+                    raise last_error
+                # 所有账号都在隔离中或未登录，按失败处理，不能当作没有推文
+                raise BackendUnavailable("Twikit账号池没有可用账号")
+            tried.add(member.username)
+            self.in_flight[member.username] += 1
+            self.last_used[member.username] = time.monotonic()
+            try:
+                return await call(member)
+            except RateLimitExceeded as e:
+                # 本地令牌桶已满，换账号
+                last_error = e
+            except Exception as e:
+                seconds = _quarantine_seconds(e)
+                if seconds is None:
+                    raise
+                self.quarantine(member, seconds, type(e).__name__)
+                last_error = e
+            finally:
+                self.in_flight[member.username] -= 1
+    
+    async def _fetch_user_tweets(self, username: str, max_results: int = 10,
+                                 since_id: str = None) -> List[Dict]:
+        return await self._run(lambda member: member._fetch_user_tweets(username, max_results, since_id))
+    
+    async def _fetch_search_tweets(self, query: str, max_results: int = 20,
+                                   since_id: str = None) -> List[Dict]:
+        return await self._run(lambda member: member._fetch_search_tweets(query, max_results, since_id))
+    
+    async def get_user_tweets(self, username: str, max_results: int = 10) -> List[Dict]:
+        """获取用户推文"""
+        try:
+            return await self._fetch_user_tweets(username, max_results)
+        except Exception as e:
+            print(f"   ❌ [Twikit] 获取推文失败: {e}")
+            return []
+    
+    async def search_tweets(self, query: str, max_results: int = 20) -> List[Dict]:
+        """搜索推文"""
+        try:
+            return await self._fetch_search_tweets(query, max_results)
         except Exception as e:
             print(f"   ❌ [Twikit] 搜索失败: {e}")
             return []
+    
+    async def _iter_member_pages(self, method: str, target: str, page_size: int) -> AsyncIterator[List[Dict]]:
+        """分页游标绑定在单个会话上，整个分页过程使用同一个账号"""
+        await self._relogin_expired()
+        member = self._pick(set())
+        if member is None:
+            raise BackendUnavailable("Twikit账号池没有可用账号")
+        self.in_flight[member.username] += 1
+        self.last_used[member.username] = time.monotonic()
+        pages = getattr(member, method)(target, page_size)
+        try:
+            async for page in pages:
+                yield page
+        except Exception as e:
+            seconds = _quarantine_seconds(e)
+            if seconds is not None:
+                self.quarantine(member, seconds, type(e).__name__)
+            raise
+        finally:
+            self.in_flight[member.username] -= 1
+            await pages.aclose()
+    
+    def iter_user_tweet_pages(self, username: str, page_size: int = 20) -> AsyncIterator[List[Dict]]:
+        return self._iter_member_pages('iter_user_tweet_pages', username, page_size)
+    
+    def iter_search_pages(self, query: str, page_size: int = 20) -> AsyncIterator[List[Dict]]:
+        return self._iter_member_pages('iter_search_pages', query, page_size)
+    
+    async def warm_user_cache(self, usernames: List[str], concurrency: int = 5) -> Dict[str, Optional[str]]:
+        """用户id缓存各账号共享，预解析请求分散到各个健康账号"""
+        if not self.members:
+            return {}
+        return await warm_user_id_cache(
+            self.members[0].user_cache, usernames,
+            lambda name: self._run(lambda member: member._resolve_user_id(name, save=False)),
+            concurrency
+        )
+
+def _format_term(keyword: str) -> str:
+    """含空格的关键词加引号作为短语搜索"""
+    return f'"{keyword}"' if ' ' in keyword else keyword
+
+def plan_search_queries(topics: Dict[str, List[str]], max_length: int = None,
+                        max_terms: int = None, max_topics: int = None) -> List[Dict]:
+    """
+    把多个话题的关键词合并成尽量少的 OR 查询，每条查询不超过长度和关键词数限制
+    max_topics 限制每条查询覆盖的话题数，使一页结果能容纳各话题所需的条数
+    返回 [{'query': 'a OR b OR c', 'topics': [...], 'keywords': [...]}]
+    """
+    max_length = max_length or SEARCH_QUERY_MAX_LENGTH
+    max_terms = max_terms or SEARCH_QUERY_MAX_TERMS
+    separator = ' OR '
+    
+    # 跨话题去重（不区分大小写），同一话题的关键词尽量放在一起
+    seen = set()
+    groups = []
+    for topic, keywords in topics.items():
+        terms = []
+        for keyword in keywords:
+            if keyword.lower() not in seen:
+                seen.add(keyword.lower())
+                terms.append(keyword)
+        if terms:
+            groups.append((topic, terms))
+    
+    # 首次适应递减装箱：按话题长度从大到小放入第一个放得下的查询
+    plans = []
+    for topic, terms in sorted(groups, key=lambda g: -len(separator.join(map(_format_term, g[1])))):
+        for term in terms:
+            formatted = _format_term(term)
+            for plan in plans:
+                length = len(plan['query']) + len(separator) + len(formatted)
+                room = topic in plan['topics'] or not max_topics or len(plan['topics']) < max_topics
+                if length <= max_length and len(plan['keywords']) < max_terms and room:
+                    plan['query'] += separator + formatted
+                    break
+            else:
+                plan = {'query': formatted, 'topics': [], 'keywords': []}
+                plans.append(plan)
+            plan['keywords'].append(term)
+            if topic not in plan['topics']:
+                plan['topics'].append(topic)
+    return plans
+
+def classify_tweet_topics(tweets: List[Dict], topics: Dict[str, List[str]]) -> Dict[str, List[Dict]]:
+    """
+    在本地把推文按关键词归类到话题（一条推文可属于多个话题）
+    英文关键词按单词边界匹配，中文关键词按子串匹配
+    """
+    patterns = {}
+    for topic, keywords in topics.items():
+        parts = []
+        for keyword in keywords:
+            escaped = re.escape(keyword)
+            parts.append(rf'\b{escaped}\b' if keyword.isascii() else escaped)
+        patterns[topic] = re.compile('|'.join(parts), re.IGNORECASE)
+    
+    classified = {topic: [] for topic in topics}
+    for tweet in tweets:
+        text = tweet.get('text', '')
+        for topic, pattern in patterns.items():
+            if pattern.search(text):
+                classified[topic].append(tweet)
+    return classified
+
+def engagement_score(tweet: Tweet) -> float:
+    """参与度分数：点赞 + 转发*2 + 回复*1.5（也接受旧的字典格式推文）"""
+    tweet = as_tweet(tweet)
+    return tweet.like_count + tweet.retweet_count * 2 + tweet.reply_count * 1.5
+
+class TweetDeduplicator:
+    """
+    按id合并多条查询返回的推文，同一推文只保留一份
+    互动数只增不减，重复出现时逐项取最大值，即最新的读数（与返回先后无关）
+    设置 max_items 时只保留参与度最高的 max_items 条，内存占用有上限
+    """
+    
+    _COUNT_FIELDS = ('like_count', 'retweet_count', 'reply_count')
+    
+    def __init__(self, max_items: int = None):
+        self.max_items = max_items or None
+        self.tweets: Dict[str, Tweet] = {}
+        self.duplicates = 0
+        self.evicted = 0
+        # 小顶堆 (分数, 序号, id)，互动数更新后旧条目延迟删除
+        self._heap = []
+        self._seq = 0
+        # 没有id的推文无法去重，各自分配一个不重复的键
+        self._anonymous = 0
+    
+    def __len__(self) -> int:
+        return len(self.tweets)
+    
+    def add(self, tweets: List[Tweet]) -> int:
+        """合并一批推文（Tweet或旧的字典格式），返回其中新出现的条数"""
+        added = 0
+        for tweet in map(as_tweet, tweets):
+            if tweet.id:
+                key = tweet.id
+            else:
+                self._anonymous += 1
+                key = f"#{self._anonymous}"
+            existing = self.tweets.get(key)
+            if existing is None:
+                self.tweets[key] = tweet
+                added += 1
+            else:
+                self.duplicates += 1
+                changed = False
+                for field in self._COUNT_FIELDS:
+                    value = getattr(tweet, field)
+                    if value > getattr(existing, field):
+                        setattr(existing, field, value)
+                        changed = True
+                if not changed:
+                    continue
+            if self.max_items:
+                self._push(key)
+        if self.max_items:
+            while len(self.tweets) > self.max_items:
+                self._evict()
+        return added
+    
+    def _push(self, key: str):
+        self._seq += 1
+        heapq.heappush(self._heap, (engagement_score(self.tweets[key]), self._seq, key))
+    
+    def _evict(self):
+        """淘汰参与度最低的推文，跳过已过期的堆条目"""
+        while self._heap:
+            score, _, key = heapq.heappop(self._heap)
+            tweet = self.tweets.get(key)
+            if tweet is not None and engagement_score(tweet) == score:
+                del self.tweets[key]
+                self.evicted += 1
+                return
+    
+    def results(self) -> List[Tweet]:
+        """去重后的推文，按首次出现的顺序"""
+        return list(self.tweets.values())
+
+def _tweet_id(tweet: Dict) -> int:
+    """推文id转为整数便于比较，无法解析时返回0"""
+    try:
+        return int(tweet.get('id') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def with_since_id(query: str, since_id: Optional[str]) -> str:
+    """为搜索语句追加 since_id: 运算符"""
+    return f"{query} since_id:{since_id}" if since_id else query
+
+def filter_newer_tweets(tweets: List[Dict], since_id: str) -> List[Dict]:
+    """只保留id大于since_id的推文"""
+    threshold = int(since_id)
+    return [tweet for tweet in tweets if _tweet_id(tweet) > threshold]
+
+def _keep_undated(tweet) -> bool:
+    """发布时间无法解析的推文保留，缺少发布时间的丢弃"""
+    return bool(tweet.get('createdAt'))
+
+def filter_recent(tweets: List[Dict], cutoff: int, ordered: bool = False) -> List[Dict]:
+    """
+    保留发布时间晚于cutoff（UTC时间戳）的推文
+    ordered=True 表示单个账号/查询从新到旧的时间线，遇到第一条过旧的推文即停止（首条可能是置顶推文，不据此停止）
+    """
+    recent = []
+    for index, tweet in enumerate(tweets):
+        created_ts = tweet_timestamp(tweet)
+        if created_ts > cutoff:
+            recent.append(tweet)
+        elif created_ts == 0:
+            if _keep_undated(tweet):
+                recent.append(tweet)
+        elif ordered and index > 0:
+            break
+    return recent
+
+def filter_recent_bulk(tweets: List[Dict], cutoff: int) -> List[Dict]:
+    """
+    批量按时间过滤：先把发布时间戳收集到连续的整数数组，再一次性比较
+    安装numpy时比较在向量化运算中完成，否则逐项比较
+    """
+    try:
+        stamps = array('q', [tweet.created_ts for tweet in tweets])
+    except AttributeError:
+        # 混有旧的字典格式推文
+        stamps = array('q', [tweet_timestamp(tweet) for tweet in tweets])
+    np = _load_optional('numpy')
+    if np is None:
+        return [tweet for tweet, created_ts in zip(tweets, stamps)
+                if created_ts > cutoff or (created_ts == 0 and _keep_undated(tweet))]
+    
+    values = np.frombuffer(stamps, dtype=np.int64)
+    keep = np.flatnonzero((values > cutoff) | (values == 0)).tolist()
+    return [tweets[index] for index in keep if stamps[index] or _keep_undated(tweets[index])]
+
+def watermark_key(operation: str, target: str) -> str:
+    """高水位键：user:<账号> 或 search:<查询>"""
+    if operation == 'user_tweets':
+        return f"user:{target.replace('@', '').strip().lower()}"
+    return f"search:{target.strip()}"
+
+class HighWaterMarks:
+    """每个账号/查询已获取到的最新推文（id + 发布时间），保存在本地JSON文件"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.marks = {}
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.marks = json.load(f)
+            except Exception as e:
+                print(f"⚠️  高水位文件加载失败，将全量获取: {e}")
+    
+    def since_id(self, key: str) -> Optional[str]:
+        mark = self.marks.get(key)
+        return mark['id'] if mark else None
+    
+    def advance(self, key: str, tweets: List[Dict]):
+        """用本批推文中最新的一条推进高水位"""
+        newest = max(tweets, key=_tweet_id)
+        newest_id = _tweet_id(newest)
+        current = self.marks.get(key)
+        if not newest_id or (current and int(current['id']) >= newest_id):
+            return
+        created_at = newest.get('createdAt', '')
+        self.marks[key] = {
+            'id': str(newest_id),
+            'created_at': created_at if isinstance(created_at, str) else str(created_at),
+            'updated_at': datetime.now().isoformat(timespec='seconds')
+        }
+        self._dirty = True
+    
+    def save(self):
+        if not self._dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.marks, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+        print(f"💾 已保存 {len(self.marks)} 个高水位到 {self.path}")
+
+def _is_auth_error(error: Exception) -> bool:
+    """判断是否为登录会话失效（如twikit.errors.Unauthorized）"""
+    status_code = getattr(error, 'status_code', None)
+    if status_code is None:
+        status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return type(error).__name__ == 'Unauthorized' or status_code == 401
+
+def twikit_session_file(username: Optional[str]) -> str:
+    """账号对应的会话文件路径"""
+    name = re.sub(r'[^A-Za-z0-9_.-]', '_', (username or 'guest').lower())
+    return os.path.join(TWIKIT_SESSION_DIR, f"twikit_session_{name}.json")
+
+def _is_backend_failure(error: Exception) -> bool:
+    """判断异常是否说明数据源本身不可用（用于熔断统计）"""
+    response = getattr(error, 'response', None)
+    status_code = getattr(response, 'status_code', None)
+    return status_code not in (400, 404)
+
+class CircuitBreaker:
+    """
+    熔断器：closed（正常）→ open（跳过该数据源）→ half_open（放行一次探测请求）
+    连续失败达到阈值后打开，冷却时间过后进入半开状态，探测成功则恢复
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 120):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+    
+    def allow_request(self) -> bool:
+        """是否允许向该数据源发送请求"""
+        if self.state == self.OPEN:
+            # 使用墙上时间，便于跨进程持久化
+            if time.time() - self.opened_at < self.recovery_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+        
+        return True
+    
+    def record_success(self) -> bool:
+        """记录成功，返回状态是否发生变化"""
+        changed = self.state != self.CLOSED
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+        return changed
+    
+    def record_failure(self) -> bool:
+        """记录失败，返回状态是否发生变化"""
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            changed = self.state != self.OPEN
+            self.state = self.OPEN
+            self.opened_at = time.time()
+            return changed
+        return False
+    
+    def release(self):
+        """请求被取消时释放探测名额"""
+        self._probe_in_flight = False
+    
+    def to_dict(self) -> Dict:
+        return {'state': self.state, 'failures': self.failures, 'opened_at': self.opened_at}
+    
+    def load(self, data: Dict):
+        self.state = data.get('state', self.CLOSED)
+        self.failures = data.get('failures', 0)
+        self.opened_at = data.get('opened_at', 0.0)
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
 
 class UnifiedTwitterClient:
     """统一Twitter客户端 - 支持多种API方案"""
@@ -213,17 +2011,85 @@ class UnifiedTwitterClient:
         self.api_client = None
         self.twikit_client = None
         
-        # 初始化TwitterAPI客户端
-        if self.twitter_api_key:
-            self.api_client = TwitterAPIClient(self.twitter_api_key)
+        # 初始化TwitterAPI客户端（回放录像时不需要真实的API密钥）
+        cassette = shared_cassette()
+        replaying = cassette is not None and cassette.replaying
+        if self.twitter_api_key or (replaying and cassette.has('twitterapi')):
+            self.api_client = TwitterAPIClient(self.twitter_api_key or 'replay')
             print("✅ TwitterAPI.io客户端已初始化")
         
-        # 初始化Twikit客户端
-        self.twikit_client = TwikitClient(
-            username=self.twitter_username,
-            password=self.twitter_password,
-            email=self.twitter_email
-        )
+        # 初始化Twikit客户端：配置了多组凭据时使用账号池
+        credentials = load_twikit_credentials()
+        if len(credentials) > 1:
+            self.twikit_client = TwikitPool(credentials)
+        else:
+            self.twikit_client = TwikitClient(
+                username=self.twitter_username,
+                password=self.twitter_password,
+                email=self.twitter_email
+            )
+        
+        # 各数据源的并发上限（信号量按事件循环惰性创建）
+        self.provider_limits = dict(PROVIDER_CONCURRENCY)
+        self._primitives = {}
+        self._primitives_loop = None
+        
+        # 对冲请求：记录TwitterAPI延迟样本和各数据源胜出次数
+        self.hedge_enabled = HEDGE_ENABLED
+        self._primary_latencies = {
+            'user_tweets': deque(maxlen=HEDGE_WINDOW),
+            'search': deque(maxlen=HEDGE_WINDOW),
+        }
+        self.backend_wins = {}
+        
+        # 按数据源和操作类型划分的熔断器
+        self.breakers = {}
+        self.breaker_state_file = BREAKER_STATE_FILE
+        self._load_breakers()
+        
+        # 增量获取：每个账号/查询的高水位（最新推文id和时间）
+        self.watermarks = HighWaterMarks(WATERMARK_FILE) if INCREMENTAL_ENABLED else None
+        
+        # 请求合并：hits为完全相同的请求，merges为被更大max_results请求覆盖的请求
+        self.coalesce_enabled = COALESCE_ENABLED
+        self.coalesce_stats = {'requests': 0, 'hits': 0, 'merges': 0}
+    
+    def _loop_primitives(self) -> Dict:
+        """获取绑定当前事件循环的信号量和锁"""
+        loop = asyncio.get_running_loop()
+        if self._primitives_loop is not loop:
+            self._primitives = {
+                'twitterapi': asyncio.Semaphore(self.provider_limits['twitterapi']),
+                'twikit': asyncio.Semaphore(self.provider_limits['twikit']),
+                'twikit_auth': asyncio.Lock(),
+                'inflight': {},
+            }
+            self._primitives_loop = loop
+        return self._primitives
+    
+    async def _ensure_twikit(self):
+        """确保Twikit已认证，并发调用时只登录一次"""
+        if self.twikit_client.authenticated:
+            return
+        async with self._loop_primitives()['twikit_auth']:
+            if not self.twikit_client.authenticated:
+                await self.authenticate_twikit()
+    
+    async def warm_up_twikit_users(self, accounts: List[str]) -> Dict[str, Optional[str]]:
+        """批量预解析Twikit所需的用户id"""
+        if not self._twikit_available():
+            return {}
+        await self._ensure_twikit()
+        return await self.twikit_client.warm_user_cache(accounts)
+    
+    async def aclose(self):
+        """释放连接池等网络资源"""
+        if self.api_client:
+            await self.api_client.aclose()
+    
+    def close(self):
+        """同步释放网络资源（在后台事件循环中关闭连接池）"""
+        run_sync(self.aclose())
     
     async def authenticate_twikit(self) -> bool:
         """认证Twikit客户端"""
@@ -231,86 +2097,437 @@ class UnifiedTwitterClient:
             return await self.twikit_client.authenticate()
         return False
     
-    async def get_user_tweets(self, username: str, max_results: int = 10) -> List[Dict]:
-        """获取用户推文 - 优先使用TwitterAPI，失败时使用Twikit"""
+    def _twikit_available(self) -> bool:
+        """Twikit库是否可用（回放时只要录像中有Twikit的响应即可）"""
+        cassette = shared_cassette()
+        if cassette is not None and cassette.replaying:
+            return bool(self.twikit_client and cassette.has('twikit'))
+        return bool(self.twikit_client and self.twikit_client.Client)
+    
+    def _breaker(self, backend: str, operation: str) -> CircuitBreaker:
+        """获取数据源+操作对应的熔断器"""
+        key = f"{backend}:{operation}"
+        if key not in self.breakers:
+            self.breakers[key] = CircuitBreaker(key, BREAKER_FAILURE_THRESHOLD, BREAKER_RECOVERY_TIMEOUT)
+        return self.breakers[key]
+    
+    def _load_breakers(self):
+        """从状态文件恢复熔断器状态（跨进程）"""
+        if not self.breaker_state_file or not os.path.exists(self.breaker_state_file):
+            return
+        try:
+            with open(self.breaker_state_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            for key, data in saved.items():
+                backend, operation = key.split(':', 1)
+                self._breaker(backend, operation).load(data)
+        except Exception as e:
+            print(f"⚠️  熔断器状态加载失败: {e}")
+    
+    def _save_breakers(self):
+        """保存熔断器状态"""
+        if not self.breaker_state_file:
+            return
+        try:
+            directory = os.path.dirname(self.breaker_state_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.breaker_state_file, 'w', encoding='utf-8') as f:
+                json.dump({key: breaker.to_dict() for key, breaker in self.breakers.items()}, f)
+        except Exception as e:
+            print(f"⚠️  熔断器状态保存失败: {e}")
+    
+    async def _call_backend(self, backend: str, operation: str, target: str, max_results: int,
+                            since_id: str = None) -> Optional[List[Dict]]:
+        """经过熔断器和并发限制调用单个数据源，失败时返回None（空列表表示请求成功但没有推文）"""
+        breaker = self._breaker(backend, operation)
+        label = 'TwitterAPI' if backend == 'twitterapi' else 'Twikit'
+        if not breaker.allow_request():
+            print(f"⚡ [{label}] {operation} 熔断中，跳过")
+            return None
+        
+        try:
+            if backend == 'twitterapi':
+                async with self._loop_primitives()['twitterapi']:
+                    start = time.perf_counter()
+                    try:
+                        if operation == 'user_tweets':
+                            tweets = await self.api_client._fetch_user_tweets_async(target, max_results, since_id)
+                        else:
+                            tweets = await self.api_client._fetch_search_tweets_async(target, max_results, since_id)
+                    finally:
+                        # 失败和对冲输掉被取消的请求也计入（取消时的耗时是实际延迟的下界），
+                        # 否则最慢的请求不会成为样本，分位数持续偏低导致越来越多地对冲到Twikit
+                        self._primary_latencies[operation].append(time.perf_counter() - start)
+            else:
+                await self._ensure_twikit()
+                async with self._loop_primitives()['twikit']:
+                    if operation == 'user_tweets':
+                        tweets = await self.twikit_client._fetch_user_tweets(target, max_results, since_id)
+                    else:
+                        tweets = await self.twikit_client._fetch_search_tweets(target, max_results, since_id)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            print(f"   ❌ [{label}] {operation} 失败: {e}")
+            if not _is_backend_failure(e):
+                # 参数错误/账号不存在等与数据源健康无关
+                breaker.record_success()
+                return None
+            if breaker.record_failure():
+                print(f"⚡ [{label}] {operation} 连续失败 {breaker.failures} 次，熔断 {breaker.recovery_timeout:.0f}s")
+                self._save_breakers()
+            return None
+        
+        if breaker.record_success():
+            print(f"✅ [{label}] {operation} 熔断恢复")
+            self._save_breakers()
+        return tweets
+    
+    async def _fetch_from_twitterapi(self, operation: str, target: str, max_results: int,
+                                     since_id: str = None) -> Optional[List[Dict]]:
+        """通过TwitterAPI.io获取数据"""
+        return await self._call_backend('twitterapi', operation, target, max_results, since_id)
+    
+    async def _fetch_from_twikit(self, operation: str, target: str, max_results: int,
+                                 since_id: str = None) -> Optional[List[Dict]]:
+        """通过Twikit获取数据"""
+        return await self._call_backend('twikit', operation, target, max_results, since_id)
+    
+    def hedge_delay(self, operation: str) -> float:
+        """根据TwitterAPI历史延迟的分位数计算对冲等待时间"""
+        samples = sorted(self._primary_latencies[operation])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DELAY
+        index = min(len(samples) - 1, int(len(samples) * HEDGE_PERCENTILE))
+        return max(HEDGE_MIN_DELAY, samples[index])
+    
+    def _record_winner(self, backend: str):
+        """记录本次请求由哪个数据源返回"""
+        self.backend_wins[backend] = self.backend_wins.get(backend, 0) + 1
+    
+    async def _fetch_hedged(self, operation: str, target: str, max_results: int,
+                            since_id: str = None) -> List[Dict]:
+        """
+        对冲请求：TwitterAPI在对冲延迟内未返回时并发请求Twikit，
+        采用先成功返回的结果（包括空结果）并取消另一个请求，都失败时抛出 BackendUnavailable
+        """
+        primary = asyncio.ensure_future(self._fetch_from_twitterapi(operation, target, max_results, since_id))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay(operation))
+        
+        if done:
+            tweets = primary.result()
+            if tweets is not None:
+                self._record_winner('twitterapi')
+                return tweets
+            # 主方案很快就失败了，直接走兜底
+            print("🔄 TwitterAPI失败，尝试Twikit兜底方案...")
+            tweets = await self._fetch_from_twikit(operation, target, max_results, since_id)
+            if tweets is None:
+                raise BackendUnavailable(f"{operation} {target}")
+            self._record_winner('twikit')
+            return tweets
+        
+        print(f"⏳ TwitterAPI超过 {self.hedge_delay(operation):.2f}s 未返回，发起Twikit对冲请求...")
+        self.backend_wins['hedged'] = self.backend_wins.get('hedged', 0) + 1
+        backends = {
+            primary: 'twitterapi',
+            asyncio.ensure_future(self._fetch_from_twikit(operation, target, max_results, since_id)): 'twikit'
+        }
+        pending = set(backends)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled() and task.exception() is None and task.result() is not None:
+                        self._record_winner(backends[task])
+                        print(f"🏁 对冲请求由 {backends[task]} 胜出")
+                        return task.result()
+            raise BackendUnavailable(f"{operation} {target}")
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _fetch(self, operation: str, target: str, max_results: int,
+                     since_id: str = None) -> List[Dict]:
+        """
+        按配置顺序或对冲方式依次尝试各数据源
+        只有请求失败才切换到兜底方案，成功返回的空结果直接返回；都失败时抛出 BackendUnavailable
+        """
+        if self.hedge_enabled and self.api_client and self._twikit_available():
+            return await self._fetch_hedged(operation, target, max_results, since_id)
         
         # 首先尝试TwitterAPI
         if self.api_client:
-            tweets = self.api_client.get_user_tweets(username, max_results)
-            if tweets:
+            tweets = await self._fetch_from_twitterapi(operation, target, max_results, since_id)
+            if tweets is not None:
+                self._record_winner('twitterapi')
                 return tweets
             print("🔄 TwitterAPI失败，尝试Twikit兜底方案...")
         
         # 使用Twikit兜底
-        if self.twikit_client:
-            if not self.twikit_client.authenticated:
-                await self.authenticate_twikit()
-            
-            tweets = await self.twikit_client.get_user_tweets(username, max_results)
-            if tweets:
+        if self._twikit_available():
+            tweets = await self._fetch_from_twikit(operation, target, max_results, since_id)
+            if tweets is not None:
+                self._record_winner('twikit')
                 return tweets
         
-        print(f"❌ 所有方案都失败，无法获取 @{username} 的推文")
-        return []
+        raise BackendUnavailable(f"{operation} {target}")
     
-    async def search_tweets(self, query: str, max_results: int = 20) -> List[Dict]:
-        """搜索推文 - 优先使用TwitterAPI，失败时使用Twikit"""
+    async def _stream(self, operation: str, target: str, page_size: int,
+                      max_total: int, max_seconds: float) -> AsyncIterator[List[Dict]]:
+        """
+        沿游标逐页产出推文，受总条数和总时长限制
+        第一页之前失败会切换到下一个数据源；已开始产出后不再切换（游标不通用）
+        """
+        deadline = time.monotonic() + max_seconds
+        remaining = max_total
+        backends = [name for name, available in (('twitterapi', self.api_client), ('twikit', self._twikit_available()))
+                    if available]
         
-        # 首先尝试TwitterAPI
-        if self.api_client:
-            tweets = self.api_client.search_tweets(query, max_results)
-            if tweets:
-                return tweets
-            print("🔄 TwitterAPI搜索失败，尝试Twikit兜底方案...")
+        for backend in backends:
+            breaker = self._breaker(backend, operation)
+            label = 'TwitterAPI' if backend == 'twitterapi' else 'Twikit'
+            if not breaker.allow_request():
+                print(f"⚡ [{label}] {operation} 熔断中，跳过")
+                continue
+            
+            if backend == 'twikit':
+                await self._ensure_twikit()
+            client = self.api_client if backend == 'twitterapi' else self.twikit_client
+            if operation == 'user_tweets':
+                pages = client.iter_user_tweet_pages(target, page_size)
+            else:
+                pages = client.iter_search_pages(target, page_size)
+            
+            produced = 0
+            outcome = None
+            completed = False
+            try:
+                while remaining > 0:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        print(f"⏱️  [{label}] 达到时间上限 {max_seconds:g}s，停止分页")
+                        break
+                    # 只在请求期间占用并发名额，消费者处理数据时不占用
+                    async with self._loop_primitives()[backend]:
+                        try:
+                            page = await asyncio.wait_for(pages.__anext__(), timeout)
+                        except StopAsyncIteration:
+                            break
+                        except asyncio.TimeoutError:
+                            print(f"⏱️  [{label}] 达到时间上限 {max_seconds:g}s，停止分页")
+                            break
+                    
+                    page = page[:remaining]
+                    remaining -= len(page)
+                    produced += len(page)
+                    yield page
+                outcome = completed = True
+            except Exception as e:
+                print(f"   ❌ [{label}] 分页 {operation} 失败: {e}")
+                outcome = not _is_backend_failure(e)
+            finally:
+                await pages.aclose()
+                if outcome is None:
+                    # 消费者提前停止或任务被取消
+                    breaker.release()
+                elif outcome:
+                    if breaker.record_success():
+                        self._save_breakers()
+                elif breaker.record_failure():
+                    self._save_breakers()
+            
+            # 请求成功（即使一页都没有）或已开始产出时不再切换数据源
+            if completed or produced:
+                return
+    
+    def stream_user_tweets(self, username: str, page_size: int = 20, max_total: int = 200,
+                           max_seconds: float = 60) -> AsyncIterator[List[Dict]]:
+        """
+        逐页获取用户推文（异步生成器）
+        用法: async for page in client.stream_user_tweets('elonmusk'): ...
+        """
+        return self._stream('user_tweets', username, page_size, max_total, max_seconds)
+    
+    def stream_search_tweets(self, query: str, page_size: int = 20, max_total: int = 200,
+                             max_seconds: float = 60) -> AsyncIterator[List[Dict]]:
+        """逐页获取搜索结果（异步生成器）"""
+        return self._stream('search', query, page_size, max_total, max_seconds)
+    
+    async def _fetch_incremental(self, operation: str, target: str, max_results: int,
+                                 since_id: Optional[str]) -> Tuple[List[Dict], Optional[str]]:
+        """增量获取：默认从高水位之后开始，并推进内存中的高水位"""
+        key = watermark_key(operation, target)
+        if since_id is None and self.watermarks is not None:
+            since_id = self.watermarks.since_id(key)
         
-        # 使用Twikit兜底
-        if self.twikit_client:
-            if not self.twikit_client.authenticated:
-                await self.authenticate_twikit()
+        tweets = await self._fetch(operation, target, max_results, since_id)
+        if since_id:
+            tweets = filter_newer_tweets(tweets, since_id)
+        if tweets and self.watermarks is not None:
+            self.watermarks.advance(key, tweets)
+        return tweets, since_id
+    
+    async def _fetch_coalesced(self, operation: str, target: str, max_results: int,
+                               since_id: Optional[str]) -> Tuple[List[Dict], Optional[str]]:
+        """
+        单飞合并：相同操作和参数的并发调用共享一个进行中的请求
+        进行中的请求max_results不小于本次时直接复用并截取结果
+        """
+        if not self.coalesce_enabled:
+            return await self._fetch_incremental(operation, target, max_results, since_id)
+        
+        self.coalesce_stats['requests'] += 1
+        normalized = target.lstrip('@').lower() if operation == 'user_tweets' else target
+        key = (operation, normalized, since_id)
+        inflight = self._loop_primitives()['inflight']
+        
+        entry = inflight.get(key)
+        if entry and entry[1] >= max_results:
+            task, size = entry
+            self.coalesce_stats['hits' if size == max_results else 'merges'] += 1
+        else:
+            task = asyncio.ensure_future(
+                self._fetch_incremental(operation, target, max_results, since_id)
+            )
+            inflight[key] = (task, max_results)
             
-            tweets = await self.twikit_client.search_tweets(query, max_results)
-            if tweets:
-                return tweets
+            def forget(done):
+                if inflight.get(key, (None,))[0] is done:
+                    del inflight[key]
+            task.add_done_callback(forget)
         
-        print(f"❌ 所有方案都失败，无法搜索: {query}")
-        return []
+        # shield避免某个调用方被取消时连带取消共享请求
+        tweets, resolved_since_id = await asyncio.shield(task)
+        return list(tweets[:max_results]), resolved_since_id
     
-    def filter_recent_tweets(self, tweets: List[Dict], hours: int = 24) -> List[Dict]:
-        """过滤最近指定小时内的推文"""
+    def save_watermarks(self):
+        """持久化高水位，应在本次运行的内容全部处理完成后调用"""
+        if self.watermarks is not None:
+            self.watermarks.save()
+    
+    async def get_user_tweets(self, username: str, max_results: int = 10, since_id: str = None,
+                              raise_on_failure: bool = False) -> List[Dict]:
+        """
+        获取用户推文 - 优先使用TwitterAPI，失败时使用Twikit
+        所有方案都失败时返回空列表，raise_on_failure=True 时抛出 BackendUnavailable 以便与"没有新推文"区分
+        """
+        try:
+            tweets, since_id = await self._fetch_coalesced('user_tweets', username, max_results, since_id)
+        except BackendUnavailable:
+            print(f"❌ 所有方案都失败，无法获取 @{username} 的推文")
+            if raise_on_failure:
+                raise
+            return []
+        
         if not tweets:
+            print(f"📭 @{username} 没有比 {since_id} 更新的推文" if since_id else f"📭 @{username} 没有推文")
+        return tweets
+    
+    async def search_tweets(self, query: str, max_results: int = 20, since_id: str = None,
+                            raise_on_failure: bool = False) -> List[Dict]:
+        """搜索推文 - 优先使用TwitterAPI，失败时使用Twikit"""
+        try:
+            tweets, since_id = await self._fetch_coalesced('search', query, max_results, since_id)
+        except BackendUnavailable:
+            print(f"❌ 所有方案都失败，无法搜索: {query}")
+            if raise_on_failure:
+                raise
             return []
         
-        cutoff_time = datetime.now() - timedelta(hours=hours)
-        recent_tweets = []
+        if not tweets:
+            print(f"📭 {query} 没有比 {since_id} 更新的推文" if since_id else f"📭 {query} 没有搜索结果")
+        return tweets
+    
+    def filter_recent_tweets(self, tweets: List[Dict], hours: int = 24, ordered: bool = False,
+                             now: float = None) -> List[Dict]:
+        """
+        过滤最近指定小时内的推文（按UTC时间戳比较）
+        ordered=True 表示单个账号/查询从新到旧的时间线，可提前结束；推文很多时使用批量过滤
+        """
+        if not tweets:
+            return []
         
-        for tweet in tweets:
-            created_at = tweet.get('createdAt', '')
-            if created_at:
-                try:
-                    # 处理不同的时间格式
-                    if isinstance(created_at, str):
-                        # ISO格式
-                        if 'T' in created_at:
-                            tweet_time = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                        else:
-                            # 其他格式，尝试解析
-                            tweet_time = datetime.strptime(created_at, '%a %b %d %H:%M:%S %z %Y')
-                    else:
-                        # 如果是datetime对象
-                        tweet_time = created_at
-                    
-                    # 移除时区信息进行比较
-                    if hasattr(tweet_time, 'replace'):
-                        tweet_time = tweet_time.replace(tzinfo=None)
-                    
-                    if tweet_time > cutoff_time:
-                        recent_tweets.append(tweet)
-                        
-                except Exception as e:
-                    print(f"⚠️  时间解析失败: {e}, 保留推文")
-                    recent_tweets.append(tweet)
+        cutoff = int((now or time.time()) - hours * 3600)
+        if ordered or len(tweets) < BULK_FILTER_MIN:
+            return filter_recent(tweets, cutoff, ordered)
+        return filter_recent_bulk(tweets, cutoff)
+
+class BackgroundLoop:
+    """
+    常驻后台线程的事件循环，供同步代码提交协程
+    所有同步调用共享同一个循环，从而复用连接池、信号量和Twikit登录状态
+    """
+    
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        """首次使用时启动后台线程"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+                
+                self._thread = threading.Thread(target=run, name='twitter-event-loop', daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+    
+    def run(self, coro, timeout: Optional[float] = None):
+        """在后台循环中执行协程并阻塞等待结果（线程安全）"""
+        loop = self._ensure_started()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("不能在后台事件循环线程内同步等待协程，请直接 await")
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+    
+    def shutdown(self, timeout: float = 5.0):
+        """取消未完成的任务并停止后台循环"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or loop.is_closed():
+            return
         
-        return recent_tweets
+        async def cancel_pending():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await loop.shutdown_asyncgens()
+        
+        try:
+            asyncio.run_coroutine_threadsafe(cancel_pending(), loop).result(timeout)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not thread.is_alive():
+            loop.close()
+
+# 进程级共享的后台循环，退出时自动关闭
+_background_loop = BackgroundLoop()
+atexit.register(_background_loop.shutdown)
+
+def run_sync(coro, timeout: Optional[float] = None):
+    """同步执行协程，复用进程级后台事件循环"""
+    return _background_loop.run(coro, timeout)
 
 # 同步包装器函数
 def create_twitter_client() -> UnifiedTwitterClient:
@@ -319,25 +2536,95 @@ def create_twitter_client() -> UnifiedTwitterClient:
 
 def get_user_tweets_sync(client: UnifiedTwitterClient, username: str, max_results: int = 10) -> List[Dict]:
     """同步获取用户推文"""
-    return asyncio.run(client.get_user_tweets(username, max_results))
+    return run_sync(client.get_user_tweets(username, max_results))
 
 def search_tweets_sync(client: UnifiedTwitterClient, query: str, max_results: int = 20) -> List[Dict]:
     """同步搜索推文"""
-    return asyncio.run(client.search_tweets(query, max_results))
+    return run_sync(client.search_tweets(query, max_results))
 
-async def get_all_monitored_tweets_async(client: UnifiedTwitterClient, accounts: List[str]) -> Dict[str, List[Dict]]:
-    """异步获取所有监控账号的推文"""
-    all_tweets = {}
+def normalize_accounts(accounts: List[str]) -> List[str]:
+    """去掉账号名两侧空白并丢弃空项（如 TWT_ACCOUNTS 末尾的逗号）"""
+    return [account.strip() for account in accounts if account and account.strip()]
+
+async def fetch_accounts_concurrently(client: UnifiedTwitterClient, accounts: List[str],
+                                      max_results: int = 10, concurrency: Optional[int] = None,
+                                      page_sizes: Optional[Dict[str, int]] = None) -> List[Dict]:
+    """
+    并发获取多个账号的推文（有界并发扇出）
+    page_sizes 可按账号指定获取条数，未指定的账号使用 max_results
+    返回与输入顺序一致的结果列表，每项包含 account/tweets/latency/error
+    """
+    page_sizes = page_sizes or {}
+    accounts = normalize_accounts(accounts)
+    semaphore = asyncio.Semaphore(concurrency or FETCH_CONCURRENCY)
     
-    for account in accounts:
-        account = account.strip()
-        if account:
-            tweets = await client.get_user_tweets(account)
-            if tweets:
-                all_tweets[account] = tweets
+    async def fetch_one(account: str) -> Dict:
+        async with semaphore:
+            # 延迟只统计实际请求耗时，不含排队时间
+            start = time.perf_counter()
+            error = None
+            try:
+                tweets = await client.get_user_tweets(account, page_sizes.get(account, max_results),
+                                                      raise_on_failure=True)
+            except Exception as e:
+                tweets = []
+                error = str(e)
+            return {
+                'account': account,
+                'tweets': tweets,
+                'latency': time.perf_counter() - start,
+                'error': error
+            }
+    
+    return await asyncio.gather(*(fetch_one(account) for account in accounts))
+
+def print_latency_report(results: List[Dict], elapsed: float, slowest: int = 5,
+                         stats: Optional[Dict] = None):
+    """打印每个账号的请求延迟统计"""
+    if not results:
+        return
+    
+    latencies = sorted(item['latency'] for item in results)
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    ok = sum(1 for item in results if item['tweets'])
+    
+    print(f"⏱️  {len(results)} 个账号耗时 {elapsed:.2f}s（成功 {ok}）"
+          f" p50={p50:.2f}s p95={p95:.2f}s max={latencies[-1]:.2f}s")
+    if stats and (stats['hits'] or stats['merges']):
+        print(f"🔗 请求合并: {stats['requests']} 次调用，完全相同 {stats['hits']}，被覆盖 {stats['merges']}")
+    for item in sorted(results, key=lambda x: x['latency'], reverse=True)[:slowest]:
+        status = '✅' if item['tweets'] else '❌'
+        print(f"   {status} @{item['account']}: {item['latency']:.2f}s")
+
+async def get_all_monitored_tweets_async(client: UnifiedTwitterClient, accounts: List[str],
+                                         concurrency: Optional[int] = None,
+                                         page_sizes: Optional[Dict[str, int]] = None,
+                                         failed: Optional[set] = None) -> Dict[str, List[Dict]]:
+    """
+    异步获取所有监控账号的推文（并发获取，结果保持输入顺序）
+    传入 failed 时把获取失败的账号加入其中，以便与没有新推文的账号区分
+    """
+    start = time.perf_counter()
+    if client.api_client is None:
+        # Twikit是主要数据源时先一次性解析所有账号的用户id
+        await client.warm_up_twikit_users(accounts)
+    results = await fetch_accounts_concurrently(client, accounts, concurrency=concurrency,
+                                                page_sizes=page_sizes)
+    print_latency_report(results, time.perf_counter() - start, stats=client.coalesce_stats)
+    
+    all_tweets = {}
+    for item in results:
+        if item['tweets']:
+            all_tweets[item['account']] = item['tweets']
+        elif item['error'] and failed is not None:
+            failed.add(item['account'])
     
     return all_tweets
 
-def get_all_monitored_tweets_sync(client: UnifiedTwitterClient, accounts: List[str]) -> Dict[str, List[Dict]]:
+def get_all_monitored_tweets_sync(client: UnifiedTwitterClient, accounts: List[str],
+                                  concurrency: Optional[int] = None,
+                                  page_sizes: Optional[Dict[str, int]] = None,
+                                  failed: Optional[set] = None) -> Dict[str, List[Dict]]:
     """同步获取所有监控账号的推文"""
-    return asyncio.run(get_all_monitored_tweets_async(client, accounts))
\ No newline at end of file
+    return run_sync(get_all_monitored_tweets_async(client, accounts, concurrency, page_sizes, failed))